@@ -0,0 +1,169 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import pandas as pd
+import psutil
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_store import DatasetSnapshot, DatasetView, prepare_frame, read_frame, write_table
+from engine import negative_bigram_percentages, wordcloud_frequencies
+from indexes import case_cube, complaint_type_counts, complaint_type_index, negative_bigrams_index, time_index
+from keywords import negative_keyword_mask
+from render_cache import rasterize
+from synthetic import CaseProfile, generate_cases
+from xlsx_reader import read_workbook
+
+SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+# Excel caps a sheet at 1,048,576 rows and writing one is slow, so only small runs
+# include the workbook stage.
+XLSX_MAX_ROWS = 100_000
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+class StageRecorder:
+    def __init__(self, trace_alloc=True):
+        self.trace_alloc = trace_alloc
+        self.process = psutil.Process()
+        self.stages = []
+
+    def run(self, name, task, rows_in=None, rows_out=len):
+        gc.collect()
+        rss_before = self.process.memory_info().rss
+        if self.trace_alloc:
+            tracemalloc.start()
+        started = time.perf_counter()
+        result = task()
+        seconds = time.perf_counter() - started
+        record = {'stage': name, 'seconds': round(seconds, 6), 'rows_in': rows_in}
+        if self.trace_alloc:
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            record.update(alloc_bytes=current, peak_alloc_bytes=peak)
+        record['rss_delta_bytes'] = self.process.memory_info().rss - rss_before
+        record['rows_out'] = rows_out(result) if callable(rows_out) else rows_out
+        self.stages.append(record)
+        print(f"  {name:<24} {seconds:9.3f} s  rows {record['rows_in']} -> {record['rows_out']}", flush=True)
+        return result
+
+
+def run_size(n, profile, workdir, trace_alloc=True, seed=0):
+    recorder = StageRecorder(trace_alloc)
+    df = recorder.run('generate', lambda: generate_cases(n, profile, seed), 0)
+
+    if n <= XLSX_MAX_ROWS:
+        workbook = os.path.join(workdir, f"cases-{n}.xlsx")
+        df.to_excel(workbook, index=False)
+        recorder.run('load_xlsx', lambda: read_workbook(workbook, workers=1)[0], n, lambda table: table.num_rows)
+        os.remove(workbook)
+
+    cache_path = os.path.join(workdir, f"cases-{n}.arrow")
+
+    def build_cache():
+        table = prepare_frame(df)
+        write_table(table, cache_path)
+        return table
+
+    recorder.run('cache_build', build_cache, n)
+    del df
+    dataset = recorder.run('cache_load', lambda: DatasetSnapshot(('bench', n), read_frame(cache_path), cache_path),
+                           n, lambda snapshot: len(snapshot.df))
+
+    opened = dataset.df['opened_at_formatted']
+    start, end = opened.min(), opened.max()
+    window_start = max(start, end - pd.Timedelta(days=90))
+    complaints = dataset.df['complaints'].value_counts().index[:3].tolist()
+
+    recorder.run('time_index', lambda: time_index(dataset), n, lambda index: len(index.values))
+    by_date = recorder.run('filter_date', lambda: DatasetView(dataset).between(window_start, end).rows, n)
+    date_view = DatasetView(dataset).between(window_start, end)
+    view = date_view.where(complaints, no_show_prediction=True)
+    recorder.run('filter_complaints', lambda: view.rows, len(by_date))
+
+    recorder.run('complaint_index', lambda: complaint_type_index(dataset), n, lambda index: index.matrix.nnz)
+    recorder.run('complaint_counts', lambda: complaint_type_index(dataset).counts(view.rows), len(view))
+    recorder.run('case_cube', lambda: case_cube(dataset), n, lambda cube: int(cube.rows.sum()))
+    recorder.run('cube_counts', lambda: complaint_type_counts(view), len(view))
+
+    recorder.run('bigram_index', lambda: negative_bigrams_index(dataset), n, lambda index: index.matrix.nnz)
+    recorder.run('keyword_mask', lambda: negative_keyword_mask(dataset), None, lambda mask: int(np.count_nonzero(mask)))
+    recorder.run('bigram_percentages', lambda: negative_bigram_percentages(view), len(view))
+    frequencies = recorder.run('wordcloud_frequencies', lambda: wordcloud_frequencies(date_view), len(date_view))
+
+    from dashboard import generate_wordcloud
+    recorder.run('wordcloud_render', lambda: rasterize(generate_wordcloud(frequencies or {'none': 1})),
+                 len(frequencies), lambda image: len(image))
+
+    os.remove(cache_path)
+    return {'rows': n, 'stages': recorder.stages}
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'memory_bytes': psutil.virtual_memory().total,
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def compare(results, baseline, threshold=1.2):
+    # Stages at least `threshold` times slower than the baseline run of the same size.
+    old = {(run['rows'], stage['stage']): stage['seconds'] for run in baseline['runs'] for stage in run['stages']}
+    slower = []
+    for run in results['runs']:
+        for stage in run['stages']:
+            before = old.get((run['rows'], stage['stage']))
+            if before and stage['seconds'] > before * threshold:
+                slower.append((run['rows'], stage['stage'], before, stage['seconds']))
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time and memory-profile each dashboard stage on synthetic case exports.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--sample', default=None, help="Workbook the synthetic distributions are measured on")
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--baseline', default=None, help="Earlier results file to compare against")
+    parser.add_argument('--threshold', type=float, default=1.2)
+    parser.add_argument('--no-trace-alloc', action='store_true', help="Skip tracemalloc (faster, RSS deltas only)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    profile = CaseProfile.from_workbook(args.sample) if args.sample else CaseProfile.from_workbook()
+    results = {'environment': environment(), 'runs': []}
+    with tempfile.TemporaryDirectory() as workdir:
+        for n in args.sizes:
+            print(f"{n:,} rows", flush=True)
+            results['runs'].append(run_size(n, profile, workdir, not args.no_trace_alloc, args.seed))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            slower = compare(results, json.load(f), args.threshold)
+        for rows, stage, before, after in slower:
+            print(f"SLOWER {rows:,} rows {stage}: {before:.3f} s -> {after:.3f} s")
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'No_Show_predicted_labelled.xlsx')
+PROFILE_COLUMNS = ['complaint_type', 'complaints', 'no_show_prediction', 'LABEL']
+TEXT_COLUMNS = ['description', 'cleaned_description', 'noun_phrases', 'named_entities']
+
+
+class CaseProfile:
+    # Distributions measured on a real export; generate_cases() draws from them.
+    def __init__(self, df):
+        self.labels = df[PROFILE_COLUMNS].reset_index(drop=True)
+        self.text = df[TEXT_COLUMNS].reset_index(drop=True)
+        self.sentiment = (float(df['sentiment_score'].mean()), float(df['sentiment_score'].std()))
+
+        bigrams = df['negative_bigrams'].fillna('').str.split(', ')
+        self.bigrams_per_case = bigrams.map(lambda row: len([b for b in row if b])).to_numpy()
+        counts = bigrams.explode().loc[lambda s: s != ''].value_counts()
+        self.vocabulary = counts.index.to_numpy(dtype=object)
+        self.vocabulary_p = (counts / counts.sum()).to_numpy()
+        # Share of bigram occurrences that are one-offs; in a larger history these keep
+        # arriving as new vocabulary rather than repeating the sample's.
+        self.novel_share = float((counts == 1).sum() / counts.sum())
+        words = pd.Series(self.vocabulary).str.split(' ').explode().value_counts()
+        self.words = words.index.to_numpy(dtype=object)
+        self.words_p = (words / words.sum()).to_numpy()
+
+        opened = pd.to_datetime(df['opened_at_formatted'], errors='coerce', format='mixed')
+        self.first, self.last = opened.min(), opened.max()
+        self.missing_dates = float(opened.isna().mean())
+
+    @classmethod
+    def from_workbook(cls, path=SAMPLE_PATH):
+        return cls(pd.read_excel(path))
+
+
+def _bigram_text(rng, profile, n, block=500_000):
+    # Built in blocks so the per-occurrence arrays stay small at 10M cases.
+    text = []
+    for start in range(0, n, block):
+        text.extend(_bigram_block(rng, profile, min(block, n - start)))
+    return text
+
+
+def _bigram_block(rng, profile, n):
+    per_case = rng.choice(profile.bigrams_per_case, size=n)
+    total = int(per_case.sum())
+    picks = profile.vocabulary[rng.choice(len(profile.vocabulary), size=total, p=profile.vocabulary_p)]
+    novel = rng.random(total) < profile.novel_share
+    first = profile.words[rng.choice(len(profile.words), size=int(novel.sum()), p=profile.words_p)]
+    second = profile.words[rng.choice(len(profile.words), size=int(novel.sum()), p=profile.words_p)]
+    picks[novel] = [f"{a} {b}" for a, b in zip(first, second)]
+    bounds = np.concatenate([[0], np.cumsum(per_case)])
+    return [', '.join(sorted(set(picks[bounds[i]:bounds[i + 1]]))) or None for i in range(n)]
+
+
+def generate_cases(n, profile, seed=0, offset=0):
+    # One synthetic SN_CUSTOMERSERVICE_CASE export with the sample's schema.  Free
+    # text is resampled from the sample, so its strings are shared, not unique.
+    rng = np.random.default_rng(seed)
+    labels = profile.labels.iloc[rng.integers(0, len(profile.labels), n)].reset_index(drop=True)
+    text = profile.text.iloc[rng.integers(0, len(profile.text), n)].reset_index(drop=True)
+
+    span = (profile.last - profile.first).value / 1e9
+    opened = profile.first + pd.to_timedelta(rng.random(n) * span, unit='s')
+    opened = pd.Series(opened.floor('s')).mask(rng.random(n) < profile.missing_dates)
+
+    df = pd.DataFrame({
+        'number': [f"CMPL{offset + i:08d}" for i in range(n)],
+        'description': text['description'],
+        'cleaned_description': text['cleaned_description'],
+        'sentiment_score': rng.normal(*profile.sentiment, n).round(5),
+        'negative_bigrams': _bigram_text(rng, profile, n),
+        'noun_phrases': text['noun_phrases'],
+        'named_entities': text['named_entities'],
+        'complaint_type': labels['complaint_type'],
+        'opened_at_formatted': opened,
+        'complaints': labels['complaints'],
+        'no_show_prediction': labels['no_show_prediction'],
+        'LABEL': labels['LABEL'],
+    })
+    return df
@@ -0,0 +1,53 @@
+import matplotlib.pyplot as plt
+import streamlit as st
+from wordcloud import WordCloud
+
+from data_store import get_shared_dataset, load_stats, memory_report, process_rss_bytes
+from debug_panel import show_debug_panel
+from engine import WORDCLOUD_MAX_WORDS
+from lazy_tabs import memo_bytes
+from render_cache import CHART_DPI, chart_key, render_cache
+
+
+def load_dataset(file_path):
+    progress_bar = st.empty()
+
+    def report(done, total):
+        progress_bar.progress(min(done / total, 1.0) if total else 0.0, text=f"Reading workbook: {done:,} rows")
+
+    dataset = get_shared_dataset(file_path, progress=report)
+    progress_bar.empty()
+    return dataset
+
+
+def render_chart(name, data, plot, **style):
+    # Charts are cached as PNG bytes keyed on their input aggregate and style, so
+    # identical filter states across sessions skip matplotlib/WordCloud entirely.
+    key = chart_key(name, data, dpi=CHART_DPI, **style)
+    image = render_cache.get_or_render(key, lambda: plot(data), name=name, rows_in=len(data), dpi=CHART_DPI)
+    # Fill the tab as st.pyplot did rather than showing the PNG at its pixel size.
+    st.image(image, width='stretch')
+
+
+def generate_wordcloud(data):
+    wordcloud = WordCloud(width=800, height=400, background_color='white',
+                          max_words=WORDCLOUD_MAX_WORDS).generate_from_frequencies(data)
+    fig, ax = plt.subplots()
+    ax.imshow(wordcloud, interpolation='bilinear')
+    ax.axis('off')
+    return fig
+
+
+def show_sidebar_status(dataset, view):
+    chart_stats = render_cache.stats()
+    st.sidebar.caption(f"Process memory: {process_rss_bytes() / 2**20:.1f} MB · "
+                       f"this session: {(view.nbytes + memo_bytes()) / 2**10:.1f} KB "
+                       f"(rows {view.nbytes / 2**10:.1f} KB, tab results {memo_bytes() / 2**10:.1f} KB) · "
+                       f"chart cache: {chart_stats['hits']} hits / {chart_stats['misses']} misses")
+    with st.sidebar.expander("Memory by column"):
+        st.dataframe(dataset.derived('memory_report', memory_report))
+        stats = dataset.derived('load_stats', lambda df: load_stats(dataset.cache_path))
+        if stats:
+            st.caption(f"Workbook parsed in {stats['seconds']:.1f} s · {stats['rows']:,} rows · "
+                       f"peak memory {stats['peak_rss_bytes'] / 2**20:.0f} MB")
+    show_debug_panel()
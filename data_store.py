@@ -0,0 +1,486 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import psutil
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+
+from indexes import CaseQuery, time_index
+from metrics import metrics
+from xlsx_reader import peak_rss_bytes, read_workbook
+
+CACHE_DIR = os.environ.get('CX_CACHE_DIR', '.cache')
+# Bump when the on-disk layout changes (e.g. row order) so old caches are rebuilt.
+CACHE_FORMAT = 3
+
+# Load schema: columns held in memory by every worker.  Free-text columns stay in
+# the memory-mapped cache and are read per request (see DatasetSnapshot.column).
+LOAD_COLUMNS = ['number', 'sentiment_score', 'negative_bigrams', 'complaint_type', 'opened_at_formatted',
+                'complaints', 'no_show_prediction', 'LABEL']
+# Written into the cache by features.py; read lazily like the free text they come from.
+FEATURE_COLUMNS = ['extracted_bigrams', 'keyword_hits']
+LAZY_COLUMNS = ['description', 'cleaned_description', 'noun_phrases', 'named_entities'] + FEATURE_COLUMNS
+CATEGORICAL_COLUMNS = ['complaint_type', 'complaints', 'LABEL']
+# Spellings of no_show_prediction seen in CSV/JSON deltas; anything else is rejected
+# rather than read as True the way bool('False') would be.
+PREDICTION_VALUES = {'true': True, 't': True, 'yes': True, 'y': True, '1': True, '1.0': True,
+                     'false': False, 'f': False, 'no': False, 'n': False, '0': False, '0.0': False, '': False}
+
+# Rows kept from the old frame, the appended delta rows, and the snapshots on
+# either side of an incremental update.
+DeltaChange = namedtuple('DeltaChange', ['keep', 'added', 'old', 'new'])
+
+
+def _source_key(file_path):
+    path_digest = hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()[:12]
+    stat = os.stat(file_path)
+    version = f"{stat.st_mtime_ns}-{stat.st_size}-{CACHE_FORMAT}"
+    version_digest = hashlib.sha1(version.encode('utf-8')).hexdigest()[:12]
+    return path_digest, version_digest
+
+
+def cache_path_for(file_path, cache_dir=CACHE_DIR):
+    path_digest, version_digest = _source_key(file_path)
+    return os.path.join(cache_dir, f"{path_digest}-{version_digest}.arrow")
+
+
+def parse_opened_at(values):
+    # Exports mix real dates with text such as 'March 2024'; parse each value on its own.
+    return pd.to_datetime(values, errors='coerce', format='mixed')
+
+
+def read_source(file_path, progress=None):
+    if file_path.lower().endswith(('.xlsx', '.xlsm')):
+        return read_workbook(file_path, progress=progress)
+    started = time.perf_counter()
+    df = pd.read_excel(file_path)
+    df['opened_at_formatted'] = parse_opened_at(df['opened_at_formatted'])
+    stats = {'rows': len(df), 'seconds': round(time.perf_counter() - started, 3)}
+    return pa.Table.from_pandas(df, preserve_index=False), stats
+
+
+def prediction_flags(values):
+    if pd.api.types.is_bool_dtype(values):
+        return values.fillna(False).astype(bool)
+    text = values.dropna().astype(str).str.strip().str.lower()
+    flags = text.map(PREDICTION_VALUES)
+    unknown = text[flags.isna()].unique()
+    if len(unknown):
+        raise ValueError(f"Unrecognised no_show_prediction values: {', '.join(sorted(unknown)[:5])}")
+    return flags.astype(bool).reindex(values.index, fill_value=False)
+
+
+def apply_schema(df):
+    for column in CATEGORICAL_COLUMNS:
+        if column in df:
+            df[column] = df[column].astype('category')
+    if 'no_show_prediction' in df:
+        df['no_show_prediction'] = prediction_flags(df['no_show_prediction'])
+    return df
+
+
+def _categorical(column):
+    # Dictionary-encoded with sorted categories, as astype('category') gives.
+    values = column.combine_chunks()
+    if pa.types.is_dictionary(values.type):
+        values = values.dictionary_decode()
+    if pa.types.is_null(values.type):
+        values = values.cast(pa.string())
+    categories = pc.unique(pc.drop_null(values))
+    categories = categories.take(pc.sort_indices(categories))
+    return pa.DictionaryArray.from_arrays(pc.index_in(values, value_set=categories), categories)
+
+
+def prepare_table(table):
+    # apply_schema and the open-time sort done in Arrow, so a build never holds a
+    # pandas copy of the export next to the table it is written from.
+    opened = table.column('opened_at_formatted')
+    if not pa.types.is_timestamp(opened.type):
+        opened = pa.array(parse_opened_at(opened.to_pandas()))
+    table = table.set_column(table.column_names.index('opened_at_formatted'), 'opened_at_formatted', opened)
+    for column in CATEGORICAL_COLUMNS:
+        if column in table.column_names:
+            table = table.set_column(table.column_names.index(column), column, _categorical(table.column(column)))
+    if 'no_show_prediction' in table.column_names:
+        prediction = pc.fill_null(table.column('no_show_prediction').cast(pa.bool_()), False)
+        table = table.set_column(table.column_names.index('no_show_prediction'), 'no_show_prediction', prediction)
+    # Keep rows in open-time order so date ranges are contiguous slices.
+    return table.sort_by([('opened_at_formatted', 'ascending')])
+
+
+def prepare_frame(df):
+    # The same schema and row order build_cache gives a workbook, for frames built
+    # in memory (e.g. benchmarks/synthetic.py).
+    return prepare_table(pa.Table.from_pandas(df, preserve_index=False).replace_schema_metadata())
+
+
+def write_columnar(df, cache_path):
+    write_table(pa.Table.from_pandas(df, preserve_index=False), cache_path)
+
+
+def write_table(table, cache_path):
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    # Uncompressed Arrow IPC so later reads can memory-map the buffers directly.
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    feather.write_feather(table, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, cache_path)
+
+
+def add_columns(cache_path, columns):
+    # Rewrites the cache with extra (or replaced) columns; readers holding the old
+    # file keep their mapping and pick up the new one on their next reload.
+    table = read_columnar(cache_path)
+    for name, values in columns.items():
+        if not isinstance(values, (pa.Array, pa.ChunkedArray)):
+            values = pa.array(values, type=pa.string(), from_pandas=True)
+        if name in table.column_names:
+            table = table.set_column(table.column_names.index(name), name, values)
+        else:
+            table = table.append_column(name, values)
+    write_table(table, cache_path)
+
+
+def _prune_stale(cache_path):
+    cache_dir = os.path.dirname(cache_path) or '.'
+    name = os.path.basename(cache_path)
+    path_digest = name.split('-', 1)[0]
+    # Delta segments and preset snapshots belong to the export they were built
+    # against; a new export supersedes them along with the old base file.
+    stem = name[:-len('.arrow')]
+    for entry in os.listdir(cache_dir):
+        if entry.startswith(stem):
+            continue
+        if entry.startswith(f"{path_digest}-") and entry.endswith(('.arrow', '.json')):
+            try:
+                os.remove(os.path.join(cache_dir, entry))
+            except OSError:
+                pass
+
+
+def build_cache(file_path, cache_dir=CACHE_DIR, progress=None):
+    cache_path = cache_path_for(file_path, cache_dir)
+    table, stats = read_source(file_path, progress)
+    sorted_table = prepare_table(table)
+    del table
+    # Covers the whole build (and anything this process did before it), not just the parse.
+    stats['peak_rss_bytes'] = max(stats.get('peak_rss_bytes', 0), peak_rss_bytes())
+    write_table(sorted_table.replace_schema_metadata({b'cx_load_stats': json.dumps(stats).encode('utf-8')}), cache_path)
+    _prune_stale(cache_path)
+    return cache_path
+
+
+def read_columnar(cache_path, columns=None):
+    return feather.read_table(cache_path, columns=columns, memory_map=True)
+
+
+def ensure_cache(file_path, cache_dir=CACHE_DIR, progress=None):
+    cache_path = cache_path_for(file_path, cache_dir)
+    if not os.path.exists(cache_path):
+        cache_path = build_cache(file_path, cache_dir, progress)
+    return cache_path
+
+
+def load_stats(cache_path):
+    # Parse time and peak memory recorded when the cache was built from the workbook.
+    metadata = read_columnar(cache_path).schema.metadata or {}
+    return json.loads(metadata.get(b'cx_load_stats', b'{}'))
+
+
+def read_frame(cache_path, columns=LOAD_COLUMNS):
+    table = read_columnar(cache_path)
+    if columns is not None:
+        table = table.select([column for column in columns if column in table.column_names])
+    return table.to_pandas()
+
+
+def delta_paths(cache_path):
+    cache_dir = os.path.dirname(cache_path) or '.'
+    prefix = os.path.basename(cache_path)[:-len('.arrow')] + '.delta-'
+    if not os.path.isdir(cache_dir):
+        return []
+    return sorted(os.path.join(cache_dir, entry) for entry in os.listdir(cache_dir)
+                  if entry.startswith(prefix) and entry.endswith('.arrow'))
+
+
+def normalize_delta(df):
+    df = df.dropna(subset=['number'])
+    if 'opened_at_formatted' in df:
+        df['opened_at_formatted'] = parse_opened_at(df['opened_at_formatted'])
+    # Last write wins within a batch, matching how segments are applied in order.
+    df = df.drop_duplicates('number', keep='last').reset_index(drop=True)
+    return apply_schema(df)
+
+
+def write_delta(cache_path, df):
+    # Single writer: segments are numbered in arrival order and published atomically.
+    delta_path = f"{cache_path[:-len('.arrow')]}.delta-{len(delta_paths(cache_path)):06d}.arrow"
+    write_columnar(normalize_delta(df), delta_path)
+    return delta_path
+
+
+def _align_categories(old, added):
+    for column in CATEGORICAL_COLUMNS:
+        if column in old and isinstance(old[column].dtype, pd.CategoricalDtype):
+            categories = old[column].cat.categories
+            values = pd.Index(added[column].dropna().astype(object).unique())
+            # Sorted like astype('category') and the cache, since previews sort by code.
+            categories = categories.append(values.difference(categories, sort=False)).sort_values()
+            added[column] = pd.Categorical(added[column].astype(object), categories=categories)
+            old[column] = old[column].cat.set_categories(categories)
+    return old, added
+
+
+def memory_report(df):
+    usage = df.memory_usage(index=False, deep=True)
+    report = pd.DataFrame({'dtype': df.dtypes.astype(str), 'bytes': usage})
+    report.loc['total'] = ['', usage.sum()]
+    return report
+
+
+class DatasetSnapshot:
+    def __init__(self, version, df, cache_path=None, columns=None):
+        self.version = version
+        self.df = df
+        self.cache_path = cache_path
+        self._derived = {}
+        self._updaters = {}
+        self._lock = threading.Lock()
+        # Where each row's lazy columns live: >= 0 is a row of the base cache file,
+        # -(k + 1) is row k of delta_text.  None while rows map 1:1 onto the cache.
+        self._locator = None
+        self.delta_text = None
+        self.columns = list(df.columns) if columns is None else columns
+        if cache_path is not None and columns is None:
+            # Keep source column order, with lazily read columns in their original place.
+            self.columns = [column for column in read_columnar(cache_path).column_names
+                            if column in df or column in LAZY_COLUMNS]
+
+    @property
+    def segments(self):
+        return self.version[1]
+
+    def column(self, name, rows=None):
+        if name in self.df:
+            column = self.df[name]
+            return column if rows is None else column.take(rows)
+        if self.cache_path is None:
+            raise KeyError(name)
+        if self._locator is not None:
+            return self._located_column(name, rows)
+        # Memory-mapped, so only the requested rows' strings are decoded.
+        column = read_columnar(self.cache_path).column(name)
+        if rows is not None:
+            column = column.take(pa.array(rows, type=pa.int64()))
+        return column.to_pandas()
+
+    def _located_column(self, name, rows):
+        located = self._locator if rows is None else self._locator[rows]
+        in_base = located >= 0
+        values = np.empty(len(located), dtype=object)
+        base = read_columnar(self.cache_path).column(name)
+        values[in_base] = base.take(pa.array(located[in_base], type=pa.int64())).to_numpy(zero_copy_only=False)
+        values[~in_base] = self.delta_text[name].to_numpy(dtype=object)[-(located[~in_base] + 1)]
+        return pd.Series(values, name=name)
+
+    def derived(self, name, builder, updater=None):
+        # Indexes built from this frame live and die with the snapshot, so a reload
+        # can never pair a new frame with an index built from the old one.  An
+        # updater(value, change) lets apply_delta carry the index forward instead.
+        value = self._derived.get(name)
+        if value is None:
+            with self._lock:
+                value = self._derived.get(name)
+                if value is None:
+                    value = self._derived[name] = builder(self.df)
+                    self._updaters[name] = updater
+        return value
+
+    def apply_delta(self, delta):
+        # Upsert by case number: replaced rows are dropped and the delta appended, so
+        # only the delta is parsed and indexed.  Derived values without an updater
+        # are dropped and rebuilt on first use.
+        keep = np.flatnonzero(~self.df['number'].isin(delta['number']).to_numpy())
+        old = self.df.take(keep)
+        added = delta.reindex(columns=self.df.columns)
+        old, added = _align_categories(old, added)
+        df = pd.concat([old, added], ignore_index=True)
+
+        snapshot = DatasetSnapshot((self.version[0], self.segments + 1), df, self.cache_path, self.columns)
+        locator = np.arange(len(self.df), dtype=np.int64) if self._locator is None else self._locator
+        text_offset = 0 if self.delta_text is None else len(self.delta_text)
+        snapshot._locator = np.concatenate([locator[keep], -(text_offset + np.arange(len(delta), dtype=np.int64) + 1)])
+        text = delta.reindex(columns=LAZY_COLUMNS)
+        snapshot.delta_text = text if self.delta_text is None else pd.concat([self.delta_text, text], ignore_index=True)
+
+        change = DeltaChange(keep, added, self, snapshot)
+        with self._lock:
+            entries = [(name, value, self._updaters.get(name)) for name, value in self._derived.items()]
+        # Insertion order, so an index is updated before anything derived from it.
+        for name, value, updater in entries:
+            if updater is not None:
+                snapshot._derived[name] = updater(value, change)
+                snapshot._updaters[name] = updater
+        return snapshot
+
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class SharedDataset:
+    def __init__(self, file_path, cache_dir=CACHE_DIR):
+        self.file_path = file_path
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def _is_current(self, snapshot, source):
+        # The base version covers the source export and the cache file itself, which
+        # features.py may rewrite in place.
+        return (snapshot is not None and snapshot.version[0][0] == source and
+                snapshot.version[0][1] == _mtime_ns(snapshot.cache_path) and
+                snapshot.segments == len(delta_paths(snapshot.cache_path)))
+
+    def get(self, progress=None):
+        source = _source_key(self.file_path)
+        snapshot = self._snapshot
+        if self._is_current(snapshot, source):
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            cache_path = ensure_cache(self.file_path, self.cache_dir, progress=progress)
+            base = (source, _mtime_ns(cache_path))
+            if snapshot is None or snapshot.version[0] != base:
+                snapshot = DatasetSnapshot((base, 0), read_frame(cache_path), cache_path)
+            # Segments are applied on top of the previous snapshot, never replayed.
+            for delta_path in delta_paths(snapshot.cache_path)[snapshot.segments:]:
+                snapshot = snapshot.apply_delta(read_frame(delta_path, columns=None))
+            self._snapshot = snapshot
+        return snapshot
+
+
+_shared_datasets = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_dataset(file_path, progress=None):
+    key = os.path.abspath(file_path)
+    with _shared_lock:
+        dataset = _shared_datasets.get(key)
+        if dataset is None:
+            dataset = _shared_datasets[key] = SharedDataset(file_path)
+    return dataset.get(progress)
+
+
+class DatasetView:
+    def __init__(self, dataset, rows=None, query=None, resolve=None, parent=None, stage=None):
+        self.dataset = dataset
+        self.df = dataset.df
+        self.query = query
+        self._rows = rows
+        self._resolve = resolve
+        self._parent = parent
+        self._stage = stage
+
+    @property
+    def rows(self):
+        # Row indices are only materialised when a consumer actually needs rows;
+        # aggregates that the case cube can answer go through self.query instead.
+        # Whichever stage first needs them, the filtering is timed as its own stage.
+        if self._resolve is not None:
+            # Resolves the parent first, so chained filters are timed apart.
+            rows_in = len(self._parent)
+            with metrics.stage(self._stage, rows_in) as record:
+                self._rows = self._resolve()
+                record.rows_out = len(self._rows)
+            self._resolve = None
+        return self._rows
+
+    @property
+    def cache_key(self):
+        # Identifies the filter state for memoising per-view results; views built
+        # from arbitrary masks have no stable identity and are never memoised.
+        if self.query is not None:
+            return (self.dataset.version, self.query)
+        if self._rows is None and self._resolve is None:
+            return (self.dataset.version, 'all')
+        return None
+
+    def __len__(self):
+        rows = self.rows
+        return len(self.df) if rows is None else len(rows)
+
+    def _case_query(self):
+        # The cube-answerable form of this view's filters; None for arbitrary rows.
+        if self.query is not None:
+            return self.query
+        if self._rows is None and self._resolve is None:
+            return CaseQuery(None, None, None, None)
+        return None
+
+    def between(self, start, end):
+        # Narrows this view: chained filters intersect, in rows and in the query alike.
+        start = pd.Timestamp(start).normalize()
+        stop = pd.Timestamp(end).normalize() + pd.Timedelta(days=1)
+        index = time_index(self.dataset)
+        parent = self
+
+        def resolve():
+            rows = index.rows_between(start, stop)
+            return rows if parent.rows is None else np.intersect1d(parent.rows, rows, assume_unique=True)
+
+        query = self._case_query()
+        if query is not None:
+            query = query._replace(start=start if query.start is None else max(query.start, start),
+                                   stop=stop if query.stop is None else min(query.stop, stop))
+        return DatasetView(self.dataset, query=query, resolve=resolve, parent=self, stage='filter_rows:date')
+
+    def where(self, complaints, no_show_prediction):
+        complaints = tuple(complaints)
+        parent = self
+
+        def resolve():
+            mask = (parent.column('complaints').isin(complaints) &
+                    (parent.column('no_show_prediction') == no_show_prediction)).to_numpy()
+            return np.flatnonzero(mask) if parent.rows is None else parent.rows[mask]
+
+        query = self._case_query()
+        if query is not None:
+            selected = complaints
+            if query.complaints is not None:
+                selected = tuple(complaint for complaint in query.complaints if complaint in complaints)
+            if query.no_show_prediction is not None and query.no_show_prediction != no_show_prediction:
+                selected = ()
+            query = query._replace(complaints=selected, no_show_prediction=no_show_prediction)
+        return DatasetView(self.dataset, query=query, resolve=resolve, parent=self, stage='filter_rows:complaints')
+
+    def column(self, name):
+        rows = self.rows
+        if rows is None:
+            return self.df[name]
+        return self.df[name].take(rows)
+
+    def frame(self, columns=None):
+        rows = self.rows
+        df = self.df if columns is None else self.df[columns]
+        return df if rows is None else df.take(rows)
+
+    @property
+    def nbytes(self):
+        # Row arrays resolved by this view and the views it narrows.
+        own = 0 if self._rows is None else self._rows.nbytes
+        return own + (0 if self._parent is None else self._parent.nbytes)
+
+
+def process_rss_bytes():
+    return psutil.Process().memory_info().rss
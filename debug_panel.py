@@ -0,0 +1,27 @@
+import os
+
+import pandas as pd
+import streamlit as st
+
+from metrics import metrics
+
+DEBUG_PANEL = os.environ.get('CX_DEBUG_PANEL') == '1'
+
+
+def debug_enabled():
+    return DEBUG_PANEL or st.query_params.get('debug') == '1'
+
+
+def show_debug_panel():
+    if not debug_enabled():
+        return
+    with st.sidebar.expander("Debug: stage timings", expanded=True):
+        stages = pd.DataFrame.from_dict(metrics.stage_summary(), orient='index')
+        if len(stages):
+            stages = stages.sort_values('p95', ascending=False)
+            st.dataframe(stages[['count', 'last', 'p50', 'p95', 'rows_in', 'rows_out', 'rss_delta_bytes', 'alloc_delta_bytes']])
+        caches = pd.DataFrame.from_dict(metrics.cache_summary(), orient='index')
+        if len(caches):
+            st.dataframe(caches)
+        st.caption("Process-wide, over the last reruns of every session. Also served as /metrics and "
+                   "/metrics.json when CX_METRICS_PORT is set.")
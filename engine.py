@@ -0,0 +1,185 @@
+import argparse
+import json
+import os
+from functools import lru_cache
+
+import pandas as pd
+
+from data_store import CACHE_DIR, DatasetView, SharedDataset, cache_path_for
+from indexes import case_count, complaint_type_counts, negative_bigrams_index
+from keywords import negative_keyword_mask
+from metrics import metrics
+
+PRESET_DAYS = [7, 30, 90]
+# WordCloud only draws its max_words (default 200) most frequent entries, so word
+# cloud aggregates stop there too.
+WORDCLOUD_MAX_WORDS = 200
+
+
+def build_view(dataset, start=None, end=None, complaints=None):
+    # Same filter semantics as the dashboard sidebar: an inclusive date range, then
+    # the selected primary complaints among predicted no-shows.
+    view = DatasetView(dataset)
+    if start is not None and end is not None:
+        view = view.between(start, end)
+    if complaints:
+        view = view.where(complaints, no_show_prediction=True)
+    return view
+
+
+def negative_bigram_percentages(view, top=10):
+    keyword_mask = negative_keyword_mask(view.dataset)
+    negative_bigrams_df = negative_bigrams_index(view.dataset).counts(view.rows, keyword_mask).rename_axis('bigram').reset_index()
+
+    negative_bigrams_df.loc[:, 'percentage'] = (negative_bigrams_df['count'] / negative_bigrams_df['count'].sum()) * 100
+    negative_bigrams_df = negative_bigrams_df.sort_values(by='percentage', ascending=False)
+    return negative_bigrams_df.head(top)
+
+
+def wordcloud_frequencies(view, unique_only=False, max_words=WORDCLOUD_MAX_WORDS):
+    word_freq = negative_bigrams_index(view.dataset).counts(view.rows)
+    if unique_only:
+        # Every bigram that occurs gets equal weight.
+        return word_freq.clip(upper=1).head(max_words).to_dict()
+    return word_freq[word_freq == 1].head(max_words).to_dict()
+
+
+AGGREGATES = {
+    'complaint_distribution': complaint_type_counts,
+    'negative_bigrams': negative_bigram_percentages,
+    'wordcloud': wordcloud_frequencies,
+    'wordcloud_unique': lambda view: wordcloud_frequencies(view, unique_only=True),
+    'records': case_count,
+}
+
+
+def compute(view, names=None):
+    return {name: AGGREGATES[name](view) for name in (names or AGGREGATES)}
+
+
+def compute_batch(dataset, filters, names=None):
+    # filters: iterable of build_view keyword dicts; one aggregate dict per entry.
+    return [compute(build_view(dataset, **f), names) for f in filters]
+
+
+def preset_key(view):
+    query = view.query
+    if query is None:
+        return 'all' if view.cache_key is not None else None
+    complaints = None if query.complaints is None else sorted(query.complaints)
+    return json.dumps([str(query.start), str(query.stop), complaints, query.no_show_prediction])
+
+
+def presets(dataset, days=PRESET_DAYS):
+    opened = dataset.df['opened_at_formatted']
+    first, last = opened.min(), opened.max()
+    if pd.isna(first):
+        return {'all': {}}
+    first, last = first.date(), last.date()
+    found = {'all': {}, 'full_range': {'start': first, 'end': last}}
+    for n in days:
+        found[f'last_{n}_days'] = {'start': max(first, last - pd.Timedelta(days=n - 1)), 'end': last}
+    for complaint in dataset.df['complaints'].dropna().unique():
+        found[f'complaint:{complaint}'] = {'start': first, 'end': last, 'complaints': [complaint]}
+    return found
+
+
+def _encode(value):
+    if isinstance(value, pd.DataFrame):
+        return {'type': 'frame', 'data': value.to_dict(orient='split', index=False)}
+    if isinstance(value, pd.Series):
+        return {'type': 'series', 'name': value.name, 'index': value.index.tolist(), 'data': value.tolist()}
+    if isinstance(value, dict):
+        return {'type': 'dict', 'data': [[key, int(count)] for key, count in value.items()]}
+    return {'type': 'value', 'data': value}
+
+
+def _decode(value):
+    if value['type'] == 'frame':
+        return pd.DataFrame(value['data']['data'], columns=value['data']['columns'])
+    if value['type'] == 'series':
+        return pd.Series(value['data'], index=value['index'], name=value['name'], dtype='int64')
+    if value['type'] == 'dict':
+        return dict(value['data'])
+    return value['data']
+
+
+def snapshot_path_for(cache_path):
+    return f"{cache_path[:-len('.arrow')]}.presets.json"
+
+
+def write_snapshot(dataset, path, days=PRESET_DAYS):
+    entries = {}
+    for name, filters in presets(dataset, days).items():
+        view = build_view(dataset, **filters)
+        entries[preset_key(view)] = {'preset': name, 'aggregates': {k: _encode(v) for k, v in compute(view).items()}}
+    snapshot = {'version': repr(dataset.version), 'days': list(days), 'presets': entries}
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path)
+    return len(entries)
+
+
+@lru_cache(maxsize=4)
+def _load_snapshot(path, mtime_ns):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_snapshot(path):
+    try:
+        return _load_snapshot(path, os.stat(path).st_mtime_ns)
+    except OSError:
+        return None
+
+
+def refresh_snapshot(source, cache_dir=CACHE_DIR):
+    # Called after ingest.py or features.py change the data, so an existing snapshot
+    # is rebuilt for the new version instead of silently going unused.
+    path = snapshot_path_for(cache_path_for(source, cache_dir))
+    snapshot = load_snapshot(path)
+    if snapshot is None:
+        return None
+    write_snapshot(SharedDataset(source, cache_dir).get(), path, snapshot.get('days', PRESET_DAYS))
+    return path
+
+
+def served(view, name):
+    # Precomputed value for this exact filter state, if the snapshot matches the data.
+    if view.dataset.cache_path is None:
+        return None
+    snapshot = load_snapshot(snapshot_path_for(view.dataset.cache_path))
+    if snapshot is None or snapshot['version'] != repr(view.dataset.version):
+        return None
+    entry = snapshot['presets'].get(preset_key(view))
+    if entry is None or name not in entry['aggregates']:
+        return None
+    return _decode(entry['aggregates'][name])
+
+
+def aggregate(view, name):
+    with metrics.stage(f'aggregate:{name}') as record:
+        value = served(view, name)
+        metrics.lookup('preset_snapshot', value is not None)
+        if value is None:
+            value = AGGREGATES[name](view)
+            record.rows_in = case_count(view)
+        record.rows_out = value if isinstance(value, int) else len(value)
+    return value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute dashboard aggregates for common filter presets.")
+    parser.add_argument('source', help="Excel export the dashboard loads")
+    parser.add_argument('--days', type=int, nargs='+', default=PRESET_DAYS)
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    args = parser.parse_args(argv)
+
+    dataset = SharedDataset(args.source, args.cache_dir).get()
+    path = snapshot_path_for(dataset.cache_path)
+    print(f"{write_snapshot(dataset, path, args.days)} presets -> {path}")
+
+
+if __name__ == '__main__':
+    main()
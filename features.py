@@ -0,0 +1,101 @@
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pyarrow as pa
+from sklearn.feature_extraction.text import CountVectorizer
+
+from data_store import CACHE_DIR, add_columns, ensure_cache, read_columnar
+from engine import refresh_snapshot
+from keywords import NEGATIVE_KEYWORDS_PATH, load_matcher
+
+FEATURE_CHUNK_ROWS = int(os.environ.get('CX_FEATURE_CHUNK_ROWS', '20000'))
+FEATURE_WORKERS = int(os.environ.get('CX_FEATURE_WORKERS', str(os.cpu_count() or 1)))
+
+
+def _join(values):
+    return ', '.join(values) if len(values) else None
+
+
+def extract_features(texts, matcher):
+    # Bigrams are counted per chunk, so the vocabulary (and memory) is bounded by the
+    # chunk rather than the corpus.  Only bigrams containing a negative keyword are kept.
+    texts = ['' if not isinstance(text, str) else text for text in texts]
+    vectorizer = CountVectorizer(ngram_range=(2, 2), stop_words='english', binary=True,
+                                 token_pattern=r"(?u)\b[a-z][a-z]+\b")
+    try:
+        matrix = vectorizer.fit_transform(texts).tocsr()
+    except ValueError:
+        # Every text in the chunk was empty or stop words only.
+        bigrams = [None] * len(texts)
+    else:
+        names = vectorizer.get_feature_names_out()
+        negative = np.flatnonzero(matcher.matches(names))
+        matrix = matrix[:, negative]
+        matrix.sort_indices()
+        names = names[negative]
+        bigrams = [_join(names[matrix.indices[matrix.indptr[i]:matrix.indptr[i + 1]]]) for i in range(len(texts))]
+    hits = [_join(matcher.hits(text)) for text in texts]
+    return bigrams, hits
+
+
+def _extract_chunk(texts, matcher):
+    bigrams, hits = extract_features(texts, matcher)
+    return pa.array(bigrams, type=pa.string()), pa.array(hits, type=pa.string())
+
+
+def build_features(cache_path, keywords_path=NEGATIVE_KEYWORDS_PATH, chunk_rows=FEATURE_CHUNK_ROWS,
+                   workers=FEATURE_WORKERS):
+    matcher = load_matcher(keywords_path)
+    texts = read_columnar(cache_path, columns=['cleaned_description']).column(0)
+    chunks = (texts.slice(start, chunk_rows).to_pylist() for start in range(0, len(texts), chunk_rows))
+    results = []
+    if workers > 1:
+        # At most two chunks per worker are in flight, so only those texts are decoded.
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(_extract_chunk, chunk, matcher))
+                if len(pending) >= 2 * workers:
+                    results.append(pending.popleft().result())
+            results.extend(future.result() for future in pending)
+    else:
+        results = [_extract_chunk(chunk, matcher) for chunk in chunks]
+    add_columns(cache_path, {
+        'extracted_bigrams': pa.chunked_array([bigrams for bigrams, _ in results], type=pa.string()),
+        'keyword_hits': pa.chunked_array([hits for _, hits in results], type=pa.string()),
+    })
+    return len(texts)
+
+
+def add_features(df, keywords_path=NEGATIVE_KEYWORDS_PATH):
+    # Used by ingest.py so delta rows carry the same columns as the rebuilt base.
+    bigrams, hits = extract_features(df['cleaned_description'].tolist(), load_matcher(keywords_path))
+    df['extracted_bigrams'] = bigrams
+    df['keyword_hits'] = hits
+    return df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract negative bigrams and keyword hits from cleaned_description into the columnar cache.")
+    parser.add_argument('source', help="Excel export the dashboard loads")
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--keywords', default=NEGATIVE_KEYWORDS_PATH)
+    parser.add_argument('--chunk-rows', type=int, default=FEATURE_CHUNK_ROWS)
+    parser.add_argument('--workers', type=int, default=FEATURE_WORKERS)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    cache_path = ensure_cache(args.source, args.cache_dir)
+    rows = build_features(cache_path, args.keywords, args.chunk_rows, args.workers)
+    print(f"{rows:,} rows in {time.perf_counter() - started:.1f} s -> {cache_path}")
+    snapshot_path = refresh_snapshot(args.source, args.cache_dir)
+    if snapshot_path:
+        print(f"presets refreshed -> {snapshot_path}")
+
+
+if __name__ == '__main__':
+    main()
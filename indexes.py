@@ -0,0 +1,294 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+
+
+def row_weights(n_rows, rows):
+    weights = np.zeros(n_rows, dtype=np.int32)
+    weights[rows] = 1
+    return weights
+
+
+# Half-open [start, stop) window on opened_at_formatted plus the sidebar's categorical filters.
+CaseQuery = namedtuple('CaseQuery', ['start', 'stop', 'complaints', 'no_show_prediction'])
+
+
+def split_bigrams(text):
+    return text.split(', ') if text else []
+
+
+class LabelIndex:
+    def __init__(self, labels, matrix):
+        self.labels = labels
+        self.matrix = matrix
+        self._first_rows = None
+
+    @classmethod
+    def from_series(cls, series, sep=','):
+        exploded = series.reset_index(drop=True).str.split(sep).explode().str.strip().dropna()
+        labels = pd.Categorical(exploded)
+        matrix = sparse.csr_matrix(
+            (np.ones(len(exploded), dtype=np.int32), (exploded.index.to_numpy(), labels.codes)),
+            shape=(len(series), len(labels.categories)),
+        )
+        return cls(labels.categories, matrix)
+
+    @classmethod
+    def from_bigrams(cls, series):
+        text = series.fillna('')
+        if not text.astype(bool).any():
+            # CountVectorizer refuses an empty vocabulary; a delta (or export) without
+            # any bigrams simply adds no label columns.
+            return cls(pd.Index([], dtype=object), sparse.csr_matrix((len(series), 0), dtype=np.int64))
+        vectorizer = CountVectorizer(tokenizer=split_bigrams, lowercase=False, token_pattern=None)
+        matrix = vectorizer.fit_transform(text)
+        return cls(pd.Index(vectorizer.get_feature_names_out()), matrix.tocsr())
+
+    def appended(self, keep, other):
+        # Rows `keep` of this index followed by the rows of `other`, over the union of
+        # both label sets; existing labels keep their column positions.
+        labels = self.labels.append(other.labels.difference(self.labels, sort=False))
+        if not labels.is_unique:
+            labels = labels.unique()
+        old = self.matrix[keep]
+        old = sparse.csr_matrix((old.data, old.indices, old.indptr), shape=(old.shape[0], len(labels)))
+        entries = other.matrix.tocoo()
+        new = sparse.csr_matrix((entries.data, (entries.row, labels.get_indexer(other.labels)[entries.col])),
+                                shape=(other.matrix.shape[0], len(labels)))
+        return LabelIndex(labels, sparse.vstack([old, new.astype(old.dtype)], format='csr'))
+
+    def totals(self, rows=None):
+        if rows is None:
+            return np.asarray(self.matrix.sum(axis=0)).ravel()
+        return self.matrix.T @ row_weights(self.matrix.shape[0], rows)
+
+    def first_rows(self, rows=None):
+        # Row (in `rows` order) each label first occurs in; absent labels get n_rows.
+        if rows is None and self._first_rows is not None:
+            return self._first_rows
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        entries = matrix.tocoo()
+        first = np.full(len(self.labels), matrix.shape[0], dtype=np.int64)
+        columns, at = np.unique(entries.col, return_index=True)
+        first[columns] = entries.row[at]
+        if rows is None:
+            self._first_rows = first
+        return first
+
+    def counts(self, rows=None, label_mask=None):
+        totals = self.totals(rows).astype(np.int64)
+        keep = totals > 0
+        if label_mask is not None:
+            keep &= label_mask
+        # Ties in first-occurrence order, as value_counts() gives, rather than the
+        # alphabetical order of the vocabulary; callers cut these lists short.  Labels
+        # first seen in the same row stay alphabetical.
+        order = np.lexsort((self.first_rows(rows)[keep], -totals[keep]))
+        return pd.Series(totals[keep][order], index=self.labels[keep][order], name='count')
+
+
+def complaint_type_index(dataset):
+    return dataset.derived(
+        'complaint_type', lambda df: LabelIndex.from_series(df['complaint_type']),
+        lambda index, change: index.appended(change.keep, LabelIndex.from_series(change.added['complaint_type'])),
+    )
+
+
+def negative_bigrams_index(dataset):
+    return dataset.derived(
+        'negative_bigrams', lambda df: LabelIndex.from_bigrams(df['negative_bigrams']),
+        lambda index, change: index.appended(change.keep, LabelIndex.from_bigrams(change.added['negative_bigrams'])),
+    )
+
+
+class TimeIndex:
+    def __init__(self, timestamps):
+        values = timestamps.to_numpy(dtype='datetime64[ns]')
+        # numpy sorts NaT last, so the valid timestamps form a sorted prefix.
+        order = np.argsort(values, kind='stable')
+        self._set(order, values[order])
+
+    def _set(self, order, sorted_values):
+        self.n_rows = len(order)
+        self.order = None if np.array_equal(order, np.arange(len(order))) else order
+        self.values = sorted_values[:np.count_nonzero(~np.isnat(sorted_values))]
+
+    def updated(self, change):
+        order = np.arange(self.n_rows) if self.order is None else self.order
+        n_keep = len(change.keep)
+        position = np.full(self.n_rows, -1, dtype=np.int64)
+        position[change.keep] = np.arange(n_keep)
+
+        n_valid = len(self.values)
+        kept = position[order[:n_valid]] >= 0
+        values = self.values[kept]
+        valid_rows = position[order[:n_valid][kept]]
+        missing_rows = position[order[n_valid:]]
+        missing_rows = missing_rows[missing_rows >= 0]
+
+        # Merge the (small) sorted delta into the already sorted survivors.
+        added = change.added['opened_at_formatted'].to_numpy(dtype='datetime64[ns]')
+        added_rows = n_keep + np.arange(len(added))
+        added_valid = ~np.isnat(added)
+        added_order = np.argsort(added[added_valid], kind='stable')
+        added_values = added[added_valid][added_order]
+        insert_at = np.searchsorted(values, added_values, side='right')
+        values = np.insert(values, insert_at, added_values)
+        valid_rows = np.insert(valid_rows, insert_at, added_rows[added_valid][added_order])
+
+        order = np.concatenate([valid_rows, missing_rows, added_rows[~added_valid]])
+        index = TimeIndex.__new__(TimeIndex)
+        index._set(order, np.concatenate([values, np.full(len(order) - len(values), np.datetime64('NaT', 'ns'))]))
+        return index
+
+    def row_range(self, start, stop):
+        lo = np.searchsorted(self.values, np.datetime64(start, 'ns'), side='left')
+        hi = np.searchsorted(self.values, np.datetime64(stop, 'ns'), side='left')
+        return lo, max(lo, hi)
+
+    def rows_between(self, start, stop):
+        lo, hi = self.row_range(start, stop)
+        if self.order is None:
+            return np.arange(lo, hi)
+        return np.sort(self.order[lo:hi])
+
+
+class CaseCube:
+    def __init__(self, df, label_index):
+        # Only days that occur get a slot, so one stray date (say 1900-01-01) costs a
+        # single row rather than a century of empty ones.
+        self.days = np.array([], dtype='datetime64[D]')
+        self.complaints = pd.Index([], dtype=object)
+        self.labels = pd.Index([], dtype=object)
+        self.rows = np.zeros((0, 1, 2), dtype=np.int64)
+        self.label_totals = np.zeros((0, 1, 2, 0), dtype=np.int64)
+        self._extend(df, label_index.labels)
+        self._accumulate(df, label_index, 1)
+        self._refresh()
+
+    def _extend(self, df, labels):
+        # Grow the day, complaint and label axes so that `df` fits; existing cells
+        # keep their day and complaint/label coordinates.
+        opened = df['opened_at_formatted'].to_numpy(dtype='datetime64[ns]')
+        days = np.unique(opened[~np.isnat(opened)].astype('datetime64[D]'))
+        new_days = np.setdiff1d(days, self.days, assume_unique=True)
+
+        complaints = pd.Index(df['complaints'].dropna().astype(object).unique())
+        new_complaints = complaints.difference(self.complaints, sort=False)
+        self.complaints = self.complaints.append(new_complaints)
+        new_labels = pd.Index(labels).difference(self.labels, sort=False)
+        self.labels = self.labels.append(new_labels)
+
+        self.rows = np.pad(self.rows, ((0, 0), (0, len(new_complaints)), (0, 0)))
+        self.label_totals = np.pad(self.label_totals, ((0, 0), (0, len(new_complaints)), (0, 0), (0, len(new_labels))))
+        if len(new_days):
+            at = np.searchsorted(self.days, new_days)
+            self.days = np.insert(self.days, at, new_days)
+            self.rows = np.insert(self.rows, at, 0, axis=0)
+            self.label_totals = np.insert(self.label_totals, at, 0, axis=0)
+
+    def _cells(self, df):
+        opened = df['opened_at_formatted'].to_numpy(dtype='datetime64[ns]')
+        valid = ~np.isnat(opened)
+        day_codes = np.zeros(len(opened), dtype=np.int64)
+        if valid.any():
+            day_codes[valid] = np.searchsorted(self.days, opened[valid].astype('datetime64[D]'))
+        # Bucket 0 holds cases with no primary complaint, so new complaints can be appended.
+        complaint_codes = self.complaints.get_indexer(df['complaints'].astype(object)) + 1
+        prediction = df['no_show_prediction'].fillna(False).to_numpy(dtype=bool).astype(np.int64)
+        cells = (day_codes * self.rows.shape[1] + complaint_codes) * 2 + prediction
+        return np.where(valid, cells, -1)
+
+    def _accumulate(self, df, label_index, sign):
+        cells = self._cells(df)
+        valid = cells >= 0
+        n_cells = self.rows.size
+        self.rows += sign * np.bincount(cells[valid], minlength=n_cells).reshape(self.rows.shape)
+
+        n_labels = len(self.labels)
+        entries = label_index.matrix.tocoo()
+        entry_cells = cells[entries.row]
+        keep = entry_cells >= 0
+        columns = self.labels.get_indexer(label_index.labels)[entries.col[keep]]
+        counts = np.bincount(entry_cells[keep] * n_labels + columns, weights=entries.data[keep],
+                             minlength=n_cells * n_labels).astype(np.int64)
+        self.label_totals += sign * counts.reshape(self.label_totals.shape)
+
+    def _refresh(self):
+        self.row_prefix = self._prefix(self.rows)
+        self.label_prefix = self._prefix(self.label_totals)
+
+    def updated(self, change, old_labels, new_labels):
+        cube = CaseCube.__new__(CaseCube)
+        cube.days = self.days
+        cube.complaints = self.complaints
+        cube.labels = self.labels
+        cube.rows = self.rows.copy()
+        cube.label_totals = self.label_totals.copy()
+
+        removed = np.setdiff1d(np.arange(old_labels.matrix.shape[0]), change.keep, assume_unique=True)
+        added = LabelIndex(new_labels.labels, new_labels.matrix[len(change.keep):])
+        cube._extend(change.added, added.labels)
+        if len(removed):
+            cube._accumulate(change.old.df.take(removed), LabelIndex(old_labels.labels, old_labels.matrix[removed]), -1)
+        cube._accumulate(change.added, added, 1)
+        cube._refresh()
+        return cube
+
+    @staticmethod
+    def _prefix(cube):
+        prefix = np.zeros((cube.shape[0] + 1,) + cube.shape[1:], dtype=np.int64)
+        np.cumsum(cube, axis=0, out=prefix[1:])
+        return prefix
+
+    def _day_bounds(self, query):
+        d0 = 0 if query.start is None else np.searchsorted(self.days, np.datetime64(query.start, 'D'))
+        d1 = len(self.days) if query.stop is None else np.searchsorted(self.days, np.datetime64(query.stop, 'D'))
+        return int(d0), int(max(d0, d1))
+
+    def _select(self, prefix, query):
+        d0, d1 = self._day_bounds(query)
+        block = prefix[d1] - prefix[d0]
+        if query.complaints is not None:
+            codes = self.complaints.get_indexer(list(query.complaints))
+            block = block[np.unique(codes[codes >= 0]) + 1]
+        if query.no_show_prediction is not None:
+            block = block[:, int(bool(query.no_show_prediction))]
+            return block.sum(axis=0)
+        return block.sum(axis=(0, 1))
+
+    def row_count(self, query):
+        return int(self._select(self.row_prefix, query))
+
+    def label_counts(self, query):
+        counts = pd.Series(self._select(self.label_prefix, query), index=self.labels, name='count')
+        return counts[counts.to_numpy() > 0].sort_values(ascending=False, kind='stable')
+
+
+def time_index(dataset):
+    return dataset.derived('time_index', lambda df: TimeIndex(df['opened_at_formatted']),
+                           lambda index, change: index.updated(change))
+
+
+def case_cube(dataset):
+    label_index = complaint_type_index(dataset)
+
+    def update(cube, change):
+        return cube.updated(change, complaint_type_index(change.old), complaint_type_index(change.new))
+
+    return dataset.derived('case_cube', lambda df: CaseCube(df, label_index), update)
+
+
+def complaint_type_counts(view):
+    if view.query is not None:
+        return case_cube(view.dataset).label_counts(view.query)
+    return complaint_type_index(view.dataset).counts(view.rows)
+
+
+def case_count(view):
+    if view.query is not None:
+        return case_cube(view.dataset).row_count(view.query)
+    return len(view)
@@ -0,0 +1,50 @@
+import argparse
+import os
+
+import pandas as pd
+
+from data_store import CACHE_DIR, FEATURE_COLUMNS, ensure_cache, read_columnar, write_delta
+from engine import refresh_snapshot
+from features import add_features
+
+CHUNK_ROWS = 100_000
+
+
+def read_delta(path, chunksize=CHUNK_ROWS):
+    # Streams the export in bounded chunks; each chunk becomes one delta segment.
+    if path.lower().endswith(('.jsonl', '.ndjson', '.json')):
+        return pd.read_json(path, lines=True, chunksize=chunksize, dtype=False)
+    return pd.read_csv(path, chunksize=chunksize)
+
+
+def ingest(source_path, delta_path, cache_dir=CACHE_DIR, chunksize=CHUNK_ROWS):
+    cache_path = ensure_cache(source_path, cache_dir)
+    # Keep delta rows in step with a base that features.py has extended.
+    with_features = set(FEATURE_COLUMNS) <= set(read_columnar(cache_path).column_names)
+    segments = []
+    for chunk in read_delta(delta_path, chunksize):
+        if with_features and 'cleaned_description' in chunk:
+            chunk = add_features(chunk)
+        if len(chunk):
+            segments.append(write_delta(cache_path, chunk))
+    return segments
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Append SN_CUSTOMERSERVICE_CASE deltas (CSV or JSONL) to the dashboard cache.")
+    parser.add_argument('source', help="Excel export the dashboard loads")
+    parser.add_argument('deltas', nargs='+', help="CSV or JSON-lines files of new or updated cases, keyed by number")
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--chunksize', type=int, default=CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    for delta_path in args.deltas:
+        segments = ingest(args.source, delta_path, args.cache_dir, args.chunksize)
+        print(f"{os.path.basename(delta_path)}: {len(segments)} segment(s) written")
+    snapshot_path = refresh_snapshot(args.source, args.cache_dir)
+    if snapshot_path:
+        print(f"presets refreshed -> {snapshot_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from indexes import negative_bigrams_index
+
+NEGATIVE_KEYWORDS_PATH = os.environ.get('CX_NEGATIVE_KEYWORDS', 'negative_keywords.txt')
+
+
+class KeywordMatcher:
+    def __init__(self, keywords):
+        self.keywords = tuple(dict.fromkeys(kw.strip() for kw in keywords if kw.strip()))
+        # Longest first so overlapping terms resolve the same way regardless of file order.
+        alternatives = sorted(self.keywords, key=len, reverse=True)
+        self.pattern = re.compile('|'.join(re.escape(kw) for kw in alternatives)) if alternatives else None
+
+    def matches(self, values):
+        values = pd.Index(values, dtype='object')
+        if self.pattern is None:
+            return np.zeros(len(values), dtype=bool)
+        return np.fromiter((self.pattern.search(value) is not None for value in values), dtype=bool, count=len(values))
+
+    def hits(self, value):
+        if self.pattern is None or not isinstance(value, str):
+            return []
+        return sorted(set(self.pattern.findall(value)))
+
+
+@lru_cache(maxsize=8)
+def _load_matcher(path, mtime_ns):
+    with open(path, encoding='utf-8') as f:
+        keywords = [line.split('#', 1)[0] for line in f]
+    return KeywordMatcher(keywords)
+
+
+def load_matcher(path=NEGATIVE_KEYWORDS_PATH):
+    return _load_matcher(os.path.abspath(path), os.stat(path).st_mtime_ns)
+
+
+def negative_keyword_mask(dataset, path=NEGATIVE_KEYWORDS_PATH):
+    matcher = load_matcher(path)
+    bigrams = negative_bigrams_index(dataset).labels
+    key = ('negative_keywords', matcher.pattern.pattern if matcher.pattern is not None else '')
+
+    def update(mask, change):
+        # Appended deltas only add labels at the end, so only those need matching.
+        labels = negative_bigrams_index(change.new).labels
+        return np.concatenate([mask, matcher.matches(labels[len(mask):])])
+
+    return dataset.derived(key, lambda df: matcher.matches(bigrams), update)
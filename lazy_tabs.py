@@ -0,0 +1,67 @@
+import os
+import sys
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from metrics import metrics
+
+TAB_MEMO_SIZE = 16
+# Per session, so the memo's share of process memory grows with the session count.
+TAB_MEMO_BYTES = int(os.environ.get('CX_TAB_MEMO_MB', '8')) * 2**20
+
+
+def open_tabs(labels, key):
+    # on_change='rerun' makes Streamlit track the selected tab, so tab.open tells
+    # us which body the user can actually see.
+    return st.tabs(labels, key=key, on_change='rerun')
+
+
+def is_open(tab):
+    return getattr(tab, 'open', None) is not False
+
+
+def run_tab(tab, task, *args):
+    if not is_open(tab):
+        return None
+    with tab, metrics.stage(f'tab:{task.__name__}'):
+        return task(*args)
+
+
+def result_bytes(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pd.Series, pd.DataFrame)):
+        return int(np.sum(value.memory_usage(index=True, deep=True)))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sys.getsizeof(key) + sys.getsizeof(item) for key, item in value.items())
+    return sys.getsizeof(value)
+
+
+def memo_bytes():
+    # Tracked size of this session's memoised tab results.
+    return sum(size for _, size in st.session_state.get('_tab_results', {}).values())
+
+
+def memoize(name, view, compute):
+    key = view.cache_key
+    if key is None:
+        return compute()
+    memo = st.session_state.setdefault('_tab_results', OrderedDict())
+    key = (name, key)
+    metrics.lookup('tab_results', key in memo)
+    if key in memo:
+        memo.move_to_end(key)
+        return memo[key][0]
+    result = compute()
+    size = result_bytes(result)
+    if size > TAB_MEMO_BYTES:
+        return result
+    memo[key] = (result, size)
+    total = memo_bytes()
+    while len(memo) > TAB_MEMO_SIZE or total > TAB_MEMO_BYTES:
+        _, (_, evicted) = memo.popitem(last=False)
+        total -= evicted
+    return result
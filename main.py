@@ -3,94 +3,97 @@ import streamlit as st
 import matplotlib.pyplot as plt
 import seaborn as sns
 from sklearn.feature_extraction.text import CountVectorizer
-from wordcloud import WordCloud
 import os
+from dashboard import generate_wordcloud, load_dataset, render_chart, show_sidebar_status
+from data_store import DatasetView
+from engine import aggregate
+from indexes import case_count
+from lazy_tabs import memoize, open_tabs, run_tab
+from metrics import metrics, start_metrics_server
+from preview import show_preview, visible_columns
 
 
 font_scale = 1.2
 def load_data():
-    file_path = r'C:\Users\Admin\Downloads\No_Show_predicted_labelled.xlsx'
-    df = pd.read_excel(file_path)
-    df['opened_at_formatted'] = pd.to_datetime(df['opened_at_formatted'], errors='coerce')
-    return df
+    return load_dataset(r'C:\Users\Admin\Downloads\No_Show_predicted_labelled.xlsx')
 
-def style_dataframe(df, hide_columns=False):
+def preview_columns(columns, hide_columns=False):
+    columns_to_hide = []
     if hide_columns:
         columns_to_hide = ['cleaned_description', 'complaints', 'no_show_prediction', 'LABEL', 'complaint_type']
-        df = df.drop(columns=columns_to_hide, errors='ignore')
-    return df
+    return visible_columns(columns, columns_to_hide)
 
-def style_filtered_dataframe(df):
+def filtered_preview_columns(columns):
     columns_to_hide = ['cleaned_description', 'no_show_prediction', 'complaints', 'LABEL']
-    df = df.drop(columns=columns_to_hide, errors='ignore')
-    return df
-def display_visualizations(df, tab1, tab2, tab3, tab4):
-      
-
-    with tab1:
-        st.markdown("<div class='data-preview'><h3 style='color: #00acce;'>🧾 SN_CUSTOMERSERVICE_CASE - Full Data Preview</h3>", unsafe_allow_html=True)
-        styled_df = style_dataframe(df, hide_columns=True)
-        st.dataframe(styled_df)
-        st.write(f"**Number of records:** {df.shape[0]}")
-        st.write(f"**Number of columns currently visible:** {styled_df.shape[1]}")
-    
-    with tab2:
-        st.markdown("<div class='card'><h4 style='color: #00acce;'>📊 Complaint Type Distribution (Bar Chart)</h4>", unsafe_allow_html=True)
-        split_df = df.assign(complaint_type=df['complaint_type'].str.split(',')).explode('complaint_type')
-        split_df['complaint_type'] = split_df['complaint_type'].str.strip()
-
-        fig, ax = plt.subplots(figsize=(10, 8))
-        sns.set(font_scale=font_scale)
-        sns.countplot(data=split_df, y='complaint_type', hue='complaint_type', order=split_df['complaint_type'].value_counts().index,
-                      ax=ax, palette='coolwarm', legend=False)
-        ax.set_xlabel("Count")
-        ax.set_ylabel("Complaint Type")
-        ax.set_title("Complaint Type Distribution")
-        st.pyplot(fig)
-    
-    with tab3:
-        st.markdown("<div class='card'><h4 style='color: #00acce;'>📊 Negative Bigrams Distribution (Percentage)</h4>", unsafe_allow_html=True)
-        negative_bigrams_df = df[['negative_bigrams']].dropna().copy()
-        negative_bigrams_df = negative_bigrams_df['negative_bigrams'].str.split(', ', expand=True).stack().value_counts().reset_index()
-        negative_bigrams_df.columns = ['bigram', 'count']
-
-        negative_keywords = ["delay", "damage", "issue", "problem", "failure", "missed", "complaint", "wrong",
-                             "error", "fault", "delay", "missing"]
-        negative_bigrams_df = negative_bigrams_df[negative_bigrams_df['bigram'].apply(lambda x: any(kw in x for kw in negative_keywords))]
-
-        negative_bigrams_df.loc[:, 'percentage'] = (negative_bigrams_df['count'] / negative_bigrams_df['count'].sum()) * 100
-        negative_bigrams_df = negative_bigrams_df.sort_values(by='percentage', ascending=False)
-        negative_bigrams_df = negative_bigrams_df.head(10)  
-
-        fig, ax = plt.subplots(figsize=(12, 10))
-        sns.set(font_scale=font_scale)
-        sns.barplot(data=negative_bigrams_df, y='bigram', x='percentage', hue='bigram', ax=ax, palette='coolwarm', legend=False)
-        ax.set_xlabel("Percentage")
-        ax.set_ylabel("Negative Bigrams")
-        ax.set_title("Top 10 Negative Bigrams by Percentage")
-        st.pyplot(fig)
-    
-    with tab4:
-        st.markdown("<div class='card'><h4 style='color: #00acce;'>🌥️ Negative Bigrams Word Cloud</h4>", unsafe_allow_html=True)
-        negative_bigrams_series = df['negative_bigrams'].dropna().str.split(', ', expand=True).stack()
-        word_freq = negative_bigrams_series.value_counts()
-        
-        
-        unique_bigrams = word_freq[word_freq == 1]
-        
-        word_dict = unique_bigrams.to_dict()
-        fig = generate_wordcloud(word_dict)
-        st.pyplot(fig)
-
-def generate_wordcloud(data):
-    wordcloud = WordCloud(width=800, height=400, background_color='white').generate_from_frequencies(data)
-    fig, ax = plt.subplots()
-    ax.imshow(wordcloud, interpolation='bilinear')
-    ax.axis('off')
+    return visible_columns(columns, columns_to_hide)
+def show_data_preview(view):
+    st.markdown("<div class='data-preview'><h3 style='color: #00acce;'>🧾 SN_CUSTOMERSERVICE_CASE - Full Data Preview</h3>", unsafe_allow_html=True)
+    visible = preview_columns(view.dataset.columns, hide_columns=True)
+    records = show_preview(view, visible, key='full_preview')
+    st.write(f"**Number of records:** {records}")
+    st.write(f"**Number of columns currently visible:** {len(visible)}")
+
+def show_filtered_data(view):
+    st.markdown("<div class='filtered-data'><h3 style='color: #00acce;'>🔍 Filtered Data</h3>", unsafe_allow_html=True)
+    visible = filtered_preview_columns(view.dataset.columns)
+    records = show_preview(view, visible, key='filtered_preview')
+    st.write(f"**Number of records:** {records}")
+    st.write(f"**Number of columns currently visible:** {len(visible)}")
+
+def show_complaint_distribution(view):
+    st.markdown("<div class='card'><h4 style='color: #00acce;'>📊 Complaint Type Distribution (Bar Chart)</h4>", unsafe_allow_html=True)
+    complaint_counts = memoize('complaint_type_distribution', view, lambda: aggregate(view, 'complaint_distribution'))
+    show_chart('complaint_type_distribution', complaint_counts, plot_complaint_distribution)
+
+def show_negative_bigrams(view):
+    st.markdown("<div class='card'><h4 style='color: #00acce;'>📊 Negative Bigrams Distribution (Percentage)</h4>", unsafe_allow_html=True)
+    negative_bigrams_df = memoize('negative_bigrams_distribution', view, lambda: aggregate(view, 'negative_bigrams'))
+    show_chart('negative_bigrams_distribution', negative_bigrams_df, plot_negative_bigrams)
+
+def show_wordcloud(view, unique_only=False):
+    st.markdown("<div class='card'><h4 style='color: #00acce;'>🌥️ Negative Bigrams Word Cloud</h4>", unsafe_allow_html=True)
+    # Filtered view: every bigram that occurs gets equal weight.
+    name = 'wordcloud_unique' if unique_only else 'wordcloud'
+    word_dict = memoize(f'negative_bigrams_{name}', view, lambda: aggregate(view, name))
+    show_chart('negative_bigrams_wordcloud', word_dict, generate_wordcloud)
+
+def display_visualizations(view, tab1, tab2, tab3, tab4):
+    run_tab(tab1, show_data_preview, view)
+    run_tab(tab2, show_complaint_distribution, view)
+    run_tab(tab3, show_negative_bigrams, view)
+    run_tab(tab4, show_wordcloud, view)
+
+def display_filtered_visualizations(view, tab1, tab2, tab3, tab4):
+    run_tab(tab1, show_filtered_data, view)
+    run_tab(tab2, show_complaint_distribution, view)
+    run_tab(tab3, show_negative_bigrams, view)
+    run_tab(tab4, show_wordcloud, view, True)
+
+def plot_complaint_distribution(complaint_counts):
+    fig, ax = plt.subplots(figsize=(10, 8))
+    sns.set(font_scale=font_scale)
+    sns.barplot(x=complaint_counts.to_numpy(), y=complaint_counts.index, hue=complaint_counts.index, order=complaint_counts.index,
+                  ax=ax, palette='coolwarm', legend=False)
+    ax.set_xlabel("Count")
+    ax.set_ylabel("Complaint Type")
+    ax.set_title("Complaint Type Distribution")
+    return fig
+
+def plot_negative_bigrams(negative_bigrams_df):
+    fig, ax = plt.subplots(figsize=(12, 10))
+    sns.set(font_scale=font_scale)
+    sns.barplot(data=negative_bigrams_df, y='bigram', x='percentage', hue='bigram', ax=ax, palette='coolwarm', legend=False)
+    ax.set_xlabel("Percentage")
+    ax.set_ylabel("Negative Bigrams")
+    ax.set_title("Top 10 Negative Bigrams by Percentage")
     return fig
 
+def show_chart(name, data, plot):
+    render_chart(name, data, plot, variant=os.path.basename(__file__), font_scale=font_scale)
+
 def main():
     st.set_page_config(page_title="CX Dashboard", layout="wide", page_icon="📊")
+    start_metrics_server()
 
     st.markdown("<div class='card' style='background-color:#74c9da;'><h3 style='font-size:45px;color: #000000; text-align: center;'> Welcome to the CX One </h1></div>", unsafe_allow_html=True)
     with open('style.css') as f:
@@ -104,7 +107,10 @@ def main():
             st.warning("Logo not found!")
 
     
-    df = load_data()
+    with metrics.stage('load_data') as record:
+        dataset = load_data()
+        df = dataset.df
+        record.rows_out = len(df)
     
     min_date = df['opened_at_formatted'].min().date()
     max_date = df['opened_at_formatted'].max().date()
@@ -117,7 +123,7 @@ def main():
 
     
     display_full_data = True
-    filtered_df = df.copy()
+    filtered_view = DatasetView(dataset)
 
     
     selected_date_range = st.sidebar.date_input(
@@ -128,8 +134,7 @@ def main():
     )
     start_date, end_date = selected_date_range
 
-    filtered_df = filtered_df[(filtered_df['opened_at_formatted'] >= pd.to_datetime(start_date)) &
-                              (filtered_df['opened_at_formatted'] <= pd.to_datetime(end_date))]
+    filtered_view = filtered_view.between(start_date, end_date)
 
     complaint_types = ["No Show", "Service Activation Issues", "Account Issues", "Awaiting Communication", 
                        "Billing Issues", "Closable Issues", "Connection Issues", "Customer Service Issues", 
@@ -142,71 +147,25 @@ def main():
     primary_complaint_type_filter = st.sidebar.multiselect("Select Complaint Type(s):", complaint_types)
 
     if primary_complaint_type_filter:
-        filtered_df = filtered_df[
-            (filtered_df['complaints'].isin(primary_complaint_type_filter)) & 
-            (filtered_df['no_show_prediction'] == True)
-        ]
+        filtered_view = filtered_view.where(primary_complaint_type_filter, no_show_prediction=True)
         display_full_data = False
 
-    tab1, tab2, tab3, tab4 = st.tabs(["📅 Data Preview", "📊 Complaint Type Distribution", "📊 Negative Bigrams Distribution", "🌥️ Negative Bigrams Word Cloud"])
+    # The case cube answers this count; resolving the matching rows is timed as
+    # filter_rows:* by whichever tab first needs them.
+    with metrics.stage('filter', len(df)) as record:
+        record.rows_out = case_count(filtered_view)
+
+    tab1, tab2, tab3, tab4 = open_tabs(["📅 Data Preview", "📊 Complaint Type Distribution", "📊 Negative Bigrams Distribution", "🌥️ Negative Bigrams Word Cloud"], key='main_tabs')
 
     if display_full_data:
-        display_visualizations(df, tab1, tab2, tab3, tab4)
+        display_visualizations(DatasetView(dataset), tab1, tab2, tab3, tab4)
     else:
-        with tab1:
-            st.markdown("<div class='filtered-data'><h3 style='color: #00acce;'>🔍 Filtered Data</h3>", unsafe_allow_html=True)
-            styled_df = style_filtered_dataframe(filtered_df)
-            st.dataframe(styled_df)
-            st.write(f"**Number of records:** {filtered_df.shape[0]}")
-            st.write(f"**Number of columns currently visible:** {styled_df.shape[1]}")
-
-        with tab2:
-            st.markdown("<div class='card'><h4 style='color: #00acce;'>📊 Complaint Type Distribution (Bar Chart)</h4>", unsafe_allow_html=True)
-            split_df = filtered_df.assign(complaint_type=filtered_df['complaint_type'].str.split(',')).explode('complaint_type')
-            split_df['complaint_type'] = split_df['complaint_type'].str.strip()
-
-            fig, ax = plt.subplots(figsize=(10, 8))
-            sns.set(font_scale=font_scale)
-            sns.countplot(data=split_df, y='complaint_type', hue='complaint_type', order=split_df['complaint_type'].value_counts().index,
-                          ax=ax, palette='coolwarm', legend=False)
-            ax.set_xlabel("Count")
-            ax.set_ylabel("Complaint Type")
-            ax.set_title("Complaint Type Distribution")
-            st.pyplot(fig)
-        
-        with tab3:
-            st.markdown("<div class='card'><h4 style='color: #00acce;'>📊 Negative Bigrams Distribution (Percentage)</h4>", unsafe_allow_html=True)
-            negative_bigrams_df = filtered_df[['negative_bigrams']].dropna().copy()
-            negative_bigrams_df = negative_bigrams_df['negative_bigrams'].str.split(', ', expand=True).stack().value_counts().reset_index()
-            negative_bigrams_df.columns = ['bigram', 'count']
-
-            negative_keywords = ["delay", "damage", "issue", "problem", "failure", "missed", "complaint", "wrong",
-                                 "error", "fault", "delay", "missing"]
-            negative_bigrams_df = negative_bigrams_df[negative_bigrams_df['bigram'].apply(lambda x: any(kw in x for kw in negative_keywords))]
-
-            negative_bigrams_df.loc[:, 'percentage'] = (negative_bigrams_df['count'] / negative_bigrams_df['count'].sum()) * 100
-            negative_bigrams_df = negative_bigrams_df.sort_values(by='percentage', ascending=False)
-            negative_bigrams_df = negative_bigrams_df.head(10)  # Keep only top 10 bigrams
-
-            fig, ax = plt.subplots(figsize=(12, 10))
-            sns.set(font_scale=font_scale)
-            sns.barplot(data=negative_bigrams_df, y='bigram', x='percentage', hue='bigram', ax=ax, palette='coolwarm', legend=False)
-            ax.set_xlabel("Percentage")
-            ax.set_ylabel("Negative Bigrams")
-            ax.set_title("Top 10 Negative Bigrams by Percentage")
-            st.pyplot(fig)
-        
-        with tab4:
-            st.markdown("<div class='card'><h4 style='color: #00acce;'>🌥️ Negative Bigrams Word Cloud</h4>", unsafe_allow_html=True)
-            unique_negative_bigrams = filtered_df['negative_bigrams'].dropna().str.split(', ', expand=True).stack().unique()
-            unique_bigrams_series = pd.Series(unique_negative_bigrams)
-            word_freq = unique_bigrams_series.value_counts()
-
-            word_dict = word_freq.to_dict()
-            fig = generate_wordcloud(word_dict)
-            st.pyplot(fig)
+        display_filtered_visualizations(filtered_view, tab1, tab2, tab3, tab4)
+
+    show_sidebar_status(dataset, filtered_view)
 
     st.markdown("</div>", unsafe_allow_html=True)
     
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with metrics.stage('rerun'):
+        main()
\ No newline at end of file
@@ -0,0 +1,191 @@
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import psutil
+
+METRICS_WINDOW = int(os.environ.get('CX_METRICS_WINDOW', '512'))
+METRICS_PORT = os.environ.get('CX_METRICS_PORT')
+# '-' logs to stderr, anything else is a file path; one JSON line per stage.
+METRICS_LOG = os.environ.get('CX_METRICS_LOG')
+TRACE_ALLOC = os.environ.get('CX_METRICS_TRACEMALLOC') == '1'
+
+logger = logging.getLogger('cx.metrics')
+if METRICS_LOG:
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.StreamHandler() if METRICS_LOG == '-' else logging.FileHandler(METRICS_LOG))
+if TRACE_ALLOC:
+    tracemalloc.start()
+
+
+class StageRecord:
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+
+
+class Metrics:
+    # Process-wide: every session's reruns land in the same windows.
+    def __init__(self, window=METRICS_WINDOW):
+        self.window = window
+        self._samples = {}
+        self._totals = {}
+        self._lookups = {}
+        self._caches = {}
+        self._lock = threading.Lock()
+        self._process = psutil.Process()
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        record = StageRecord(name, rows_in)
+        rss_before = self._process.memory_info().rss
+        traced_before = tracemalloc.get_traced_memory()[0] if TRACE_ALLOC else None
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            sample = {
+                'stage': name,
+                'seconds': time.perf_counter() - started,
+                'rows_in': record.rows_in,
+                'rows_out': record.rows_out,
+                'rss_delta_bytes': self._process.memory_info().rss - rss_before,
+            }
+            if TRACE_ALLOC:
+                sample['alloc_delta_bytes'] = tracemalloc.get_traced_memory()[0] - traced_before
+            self._add(sample)
+
+    def _add(self, sample):
+        name = sample['stage']
+        with self._lock:
+            self._samples.setdefault(name, deque(maxlen=self.window)).append(sample)
+            count, total = self._totals.get(name, (0, 0.0))
+            self._totals[name] = (count + 1, total + sample['seconds'])
+        if METRICS_LOG:
+            logger.info(json.dumps(sample))
+
+    def lookup(self, cache, hit):
+        with self._lock:
+            hits, misses = self._lookups.get(cache, (0, 0))
+            self._lookups[cache] = (hits + 1, misses) if hit else (hits, misses + 1)
+
+    def register_cache(self, cache, stats):
+        # For caches that keep their own counters, e.g. RenderCache.stats.
+        self._caches[cache] = stats
+
+    def stage_summary(self):
+        with self._lock:
+            samples = {name: list(window) for name, window in self._samples.items()}
+            totals = dict(self._totals)
+        summary = {}
+        for name, window in samples.items():
+            seconds = np.array([sample['seconds'] for sample in window])
+            last = window[-1]
+            summary[name] = {
+                'count': totals[name][0],
+                'seconds_total': totals[name][1],
+                'p50': float(np.percentile(seconds, 50)),
+                'p95': float(np.percentile(seconds, 95)),
+                'max': float(seconds.max()),
+                'last': last['seconds'],
+                'rows_in': last['rows_in'],
+                'rows_out': last['rows_out'],
+                'rss_delta_bytes': last['rss_delta_bytes'],
+                'alloc_delta_bytes': last.get('alloc_delta_bytes'),
+            }
+        return summary
+
+    def cache_summary(self):
+        with self._lock:
+            caches = {name: {'hits': hits, 'misses': misses} for name, (hits, misses) in self._lookups.items()}
+        for name, stats in list(self._caches.items()):
+            found = stats()
+            caches[name] = {'hits': found['hits'], 'misses': found['misses']}
+        for found in caches.values():
+            lookups = found['hits'] + found['misses']
+            found['hit_rate'] = found['hits'] / lookups if lookups else 0.0
+        return caches
+
+    def to_json(self):
+        return {'stages': self.stage_summary(), 'caches': self.cache_summary(),
+                'process_rss_bytes': self._process.memory_info().rss}
+
+    def prometheus_text(self):
+        lines = [
+            '# HELP cx_stage_seconds Wall time per dashboard stage (quantiles over the recent window).',
+            '# TYPE cx_stage_seconds summary',
+        ]
+        stages = self.stage_summary()
+        for name, found in sorted(stages.items()):
+            for quantile in ('p50', 'p95'):
+                lines.append(f'cx_stage_seconds{{stage="{name}",quantile="0.{quantile[1:]}"}} {found[quantile]:.6f}')
+            lines.append(f'cx_stage_seconds_sum{{stage="{name}"}} {found["seconds_total"]:.6f}')
+            lines.append(f'cx_stage_seconds_count{{stage="{name}"}} {found["count"]}')
+        lines += ['# HELP cx_stage_rows_out Rows produced by the latest run of each stage.',
+                  '# TYPE cx_stage_rows_out gauge']
+        lines += [f'cx_stage_rows_out{{stage="{name}"}} {found["rows_out"]}'
+                  for name, found in sorted(stages.items()) if found['rows_out'] is not None]
+        lines += ['# HELP cx_stage_rss_delta_bytes RSS change across the latest run of each stage.',
+                  '# TYPE cx_stage_rss_delta_bytes gauge']
+        lines += [f'cx_stage_rss_delta_bytes{{stage="{name}"}} {found["rss_delta_bytes"]}' for name, found in sorted(stages.items())]
+        caches = self.cache_summary()
+        lines += ['# HELP cx_cache_lookups_total Cache lookups by result.', '# TYPE cx_cache_lookups_total counter']
+        for name, found in sorted(caches.items()):
+            lines.append(f'cx_cache_lookups_total{{cache="{name}",result="hit"}} {found["hits"]}')
+            lines.append(f'cx_cache_lookups_total{{cache="{name}",result="miss"}} {found["misses"]}')
+        lines += ['# HELP cx_process_rss_bytes Resident memory of this dashboard process.',
+                  '# TYPE cx_process_rss_bytes gauge',
+                  f'cx_process_rss_bytes {self._process.memory_info().rss}']
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] == '/metrics':
+            body, content_type = metrics.prometheus_text(), 'text/plain; version=0.0.4'
+        elif self.path.split('?')[0] == '/metrics.json':
+            body, content_type = json.dumps(metrics.to_json()), 'application/json'
+        else:
+            self.send_error(404)
+            return
+        body = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=METRICS_PORT):
+    # Serves /metrics (Prometheus text) and /metrics.json from a daemon thread, once
+    # per process.  A port already taken by another worker is left to that worker.
+    global _server
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer(('', int(port)), _MetricsHandler)
+            except OSError:
+                _server = False
+            else:
+                threading.Thread(target=_server.serve_forever, name='cx-metrics', daemon=True).start()
+    return _server or None
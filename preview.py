@@ -0,0 +1,99 @@
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from indexes import time_index
+from metrics import metrics
+from render_cache import RenderCache
+
+PAGE_SIZES = [25, 50, 100, 250]
+ROW_ORDER_CACHE_BYTES = int(os.environ.get('CX_ROW_ORDER_CACHE_MB', '64')) * 2**20
+
+# Process-wide and bounded by bytes: a sort or search over the same data yields the
+# same row order for every session, and one order holds 8 bytes per matching row.
+row_orders = RenderCache(ROW_ORDER_CACHE_BYTES, sizeof=lambda rows: rows.nbytes)
+metrics.register_cache('row_orders', row_orders.stats)
+
+
+def visible_columns(columns, columns_to_hide):
+    return [column for column in columns if column not in columns_to_hide]
+
+
+def search_rows(dataset, rows, columns, term):
+    if not term:
+        return rows
+    rows = np.arange(len(dataset.df)) if rows is None else rows
+    matches = np.zeros(len(rows), dtype=bool)
+    for column in columns:
+        values = dataset.column(column, rows).astype('string')
+        matches |= values.str.contains(term, case=False, regex=False, na=False).to_numpy(dtype=bool)
+    return rows[matches]
+
+
+def sort_rows(dataset, rows, sort_by, ascending=True):
+    if sort_by is None:
+        return rows
+    values = dataset.column(sort_by, rows)
+    order = values.reset_index(drop=True).sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+    return order if rows is None else rows[order]
+
+
+def preview_order(view, columns, sort_by=None, ascending=True, search=None):
+    rows = search_rows(view.dataset, view.rows, columns, search)
+    return sort_rows(view.dataset, rows, sort_by, ascending)
+
+
+def preview_rows(view, columns, sort_by=None, ascending=True, search=None):
+    if sort_by is None:
+        # "Open time": the stored row order, until deltas append rows out of order.
+        if ascending and not search and time_index(view.dataset).order is None:
+            return view.rows
+        sort_by = 'opened_at_formatted'
+    if view.cache_key is None:
+        return preview_order(view, columns, sort_by, ascending, search)
+    key = (view.cache_key, tuple(columns) if search else None, sort_by, ascending, search)
+    rows = row_orders.get(key)
+    if rows is None:
+        rows = preview_order(view, columns, sort_by, ascending, search)
+        row_orders.put(key, rows)
+    return rows
+
+
+def row_count(view, rows):
+    return len(view.df) if rows is None else len(rows)
+
+
+def page_frame(view, rows, columns, page, page_size):
+    total = row_count(view, rows)
+    start = min(max(page - 1, 0) * page_size, total)
+    stop = min(start + page_size, total)
+    page_rows = np.arange(start, stop) if rows is None else rows[start:stop]
+    # Only the projected columns of the requested page are ever materialised;
+    # free-text columns are read for these rows straight from the columnar cache.
+    frame = pd.DataFrame({column: view.dataset.column(column, page_rows).to_numpy() for column in columns},
+                         index=page_rows, columns=columns)
+    return frame
+
+
+def show_preview(view, columns, key):
+    search_col, sort_col, order_col, size_col = st.columns([3, 2, 1, 1])
+    search = search_col.text_input("Search", key=f"{key}_search").strip()
+    sort_by = sort_col.selectbox("Sort by", [None] + list(columns), key=f"{key}_sort",
+                                 format_func=lambda column: "Open time" if column is None else column)
+    ascending = order_col.selectbox("Order", ["Ascending", "Descending"], key=f"{key}_order") == "Ascending"
+    page_size = size_col.selectbox("Rows per page", PAGE_SIZES, key=f"{key}_page_size")
+
+    rows = preview_rows(view, columns, sort_by, ascending, search)
+    total = row_count(view, rows)
+    page_count = max(1, -(-total // page_size))
+    # Back to the first page whenever the rows or their order change.
+    shown = (view.cache_key, search, sort_by, ascending, page_size)
+    if st.session_state.get(f"{key}_page_rows") != shown:
+        st.session_state[f"{key}_page_rows"] = shown
+        st.session_state[f"{key}_page"] = 1
+    page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, step=1, key=f"{key}_page")
+
+    st.dataframe(page_frame(view, rows, columns, int(page), page_size))
+    return total
@@ -0,0 +1,98 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import matplotlib.pyplot as plt
+import pandas as pd
+
+from metrics import metrics
+
+RENDER_CACHE_BYTES = int(os.environ.get('CX_RENDER_CACHE_MB', '64')) * 2**20
+# What st.pyplot saves at; lower values show up as blurry charts once stretched.
+CHART_DPI = 200
+
+
+def chart_key(name, data, **style):
+    digest = hashlib.sha1(name.encode('utf-8'))
+    if isinstance(data, (pd.Series, pd.DataFrame)):
+        digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+        columns = data.columns if isinstance(data, pd.DataFrame) else [data.name]
+        digest.update(repr(list(columns)).encode('utf-8'))
+    elif isinstance(data, dict):
+        digest.update(repr(sorted(data.items())).encode('utf-8'))
+    else:
+        digest.update(repr(data).encode('utf-8'))
+    digest.update(repr(sorted(style.items())).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class RenderCache:
+    def __init__(self, max_bytes=RENDER_CACHE_BYTES, sizeof=len):
+        # sizeof measures an entry; images are bytes, other callers pass their own.
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            image = self._entries.get(key)
+            if image is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return image
+
+    def put(self, key, image):
+        if self.sizeof(image) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= self.sizeof(previous)
+            self._entries[key] = image
+            self.size += self.sizeof(image)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= self.sizeof(evicted)
+                self.evictions += 1
+
+    def get_or_render(self, key, render, fmt='png', name='chart', rows_in=None, dpi=CHART_DPI):
+        image = self.get(key)
+        if image is None:
+            with metrics.stage(f'render:{name}', rows_in):
+                image = rasterize(render(), fmt, dpi)
+            self.put(key, image)
+        return image
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+def rasterize(fig, fmt='png', dpi=CHART_DPI):
+    buffer = io.BytesIO()
+    try:
+        fig.savefig(buffer, format=fmt, dpi=dpi, bbox_inches='tight')
+    finally:
+        plt.close(fig)
+    return buffer.getvalue()
+
+
+render_cache = RenderCache()
+metrics.register_cache('render', render_cache.stats)
@@ -0,0 +1,128 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_store import DatasetSnapshot, apply_schema, normalize_delta, read_frame, write_columnar, write_delta
+from indexes import CaseQuery, LabelIndex, case_cube, complaint_type_index, negative_bigrams_index, time_index
+from preview import sort_rows
+
+QUERIES = [
+    CaseQuery(None, None, None, None),
+    CaseQuery(pd.Timestamp('2024-03-01'), pd.Timestamp('2024-03-03'), None, None),
+    CaseQuery(pd.Timestamp('1899-12-31'), pd.Timestamp('1900-01-02'), None, None),
+    CaseQuery(None, None, ('Billing', 'Refund'), True),
+    CaseQuery(pd.Timestamp('2024-03-02'), pd.Timestamp('2024-04-01'), ('No Show',), False),
+]
+
+
+def cases(numbers, opened, complaints, bigrams, prediction):
+    return pd.DataFrame({
+        'number': numbers,
+        'description': [f"case {number}" for number in numbers],
+        'negative_bigrams': bigrams,
+        'complaint_type': [None if complaint is None else f"{complaint}, Follow up" for complaint in complaints],
+        'opened_at_formatted': opened,
+        'complaints': complaints,
+        'no_show_prediction': prediction,
+    })
+
+
+def base_cases():
+    return cases(
+        ['CS1', 'CS2', 'CS3', 'CS4', 'CS5'],
+        ['2024-03-01 09:00', '2024-03-01 17:30', '2024-03-02 08:00', '2024-03-04 12:00', None],
+        ['Billing', 'No Show', 'Billing', None, 'No Show'],
+        ['late bus, rude driver', None, 'late bus', 'wrong fare', 'rude driver'],
+        [True, False, True, False, True],
+    )
+
+
+def snapshot_with_indexes(df):
+    snapshot = DatasetSnapshot(('base', 0), df)
+    time_index(snapshot)
+    negative_bigrams_index(snapshot)
+    case_cube(snapshot)
+    return snapshot
+
+
+def assert_matches_rebuild(updated):
+    rebuilt = snapshot_with_indexes(updated.df.copy())
+    for query in QUERIES:
+        assert case_cube(updated).row_count(query) == case_cube(rebuilt).row_count(query)
+        assert case_cube(updated).label_counts(query).sort_index().equals(case_cube(rebuilt).label_counts(query).sort_index())
+    assert np.array_equal(time_index(updated).values, time_index(rebuilt).values)
+    for start, stop in [('1900-01-01', '2100-01-01'), ('2024-03-01', '2024-03-02'), ('2024-03-02', '2024-04-01')]:
+        start, stop = pd.Timestamp(start), pd.Timestamp(stop)
+        assert np.array_equal(time_index(updated).rows_between(start, stop), time_index(rebuilt).rows_between(start, stop))
+    rows = np.arange(0, len(updated.df), 2)
+    for index in (negative_bigrams_index, complaint_type_index):
+        assert index(updated).counts().sort_index().equals(index(rebuilt).counts().sort_index())
+        assert index(updated).counts(rows).sort_index().equals(index(rebuilt).counts(rows).sort_index())
+
+
+def test_delta_matches_full_rebuild():
+    base = snapshot_with_indexes(apply_schema(normalize_delta(base_cases())))
+    delta = normalize_delta(cases(
+        ['CS2', 'CS4', 'CS6', 'CS7'],
+        ['1900-01-01', 'March 2024', '2024-03-03 10:00', None],
+        ['Refund', 'Billing', 'Refund', 'No Show'],
+        ['lost ticket', None, 'late bus, lost ticket', None],
+        [True, True, False, None],
+    ))
+
+    updated = base.apply_delta(delta)
+
+    assert updated.df['number'].tolist() == ['CS1', 'CS3', 'CS5', 'CS2', 'CS4', 'CS6', 'CS7']
+    assert_matches_rebuild(updated)
+
+
+def test_delta_without_bigrams(tmp_path):
+    cache_path = str(tmp_path / 'cases.arrow')
+    write_columnar(normalize_delta(base_cases()), cache_path)
+    base = snapshot_with_indexes(read_frame(cache_path))
+    delta = cases(['CS1', 'CS8'], ['2024-03-05', '2024-03-06'], ['Billing', 'Refund'], [None, None], [True, True])
+
+    updated = base.apply_delta(read_frame(write_delta(cache_path, delta.drop(columns='negative_bigrams')), columns=None))
+
+    assert negative_bigrams_index(updated).matrix.shape == (len(updated.df), 3)
+    assert_matches_rebuild(updated)
+
+
+def test_empty_bigrams_have_no_labels():
+    index = LabelIndex.from_bigrams(pd.Series([None, '', None], dtype=object))
+
+    assert index.matrix.shape == (3, 0)
+    assert index.counts().empty
+
+
+def test_normalize_delta_parses_mixed_dates():
+    delta = normalize_delta(cases(['CS1', 'CS2', 'CS3'], ['2024-03-01 09:00', 'March 2024', 'not a date'],
+                                  ['Billing'] * 3, [None] * 3, [True] * 3))
+
+    assert delta['opened_at_formatted'].tolist()[:2] == [pd.Timestamp('2024-03-01 09:00'), pd.Timestamp('2024-03-01')]
+    assert pd.isna(delta['opened_at_formatted'].iloc[2])
+
+
+def test_delta_categories_stay_sorted():
+    base = snapshot_with_indexes(normalize_delta(base_cases()))
+    delta = normalize_delta(cases(['CS9'], ['2024-03-05'], ['Account Issues'], [None], [False]))
+
+    updated = base.apply_delta(delta)
+
+    assert list(updated.df['complaints'].cat.categories) == ['Account Issues', 'Billing', 'No Show']
+    rows = sort_rows(updated, None, 'complaints')
+    assert updated.df['complaints'].take(rows).dropna().tolist() == sorted(updated.df['complaints'].dropna())
+
+
+def test_normalize_delta_reads_prediction_text():
+    delta = normalize_delta(cases(['CS1', 'CS2', 'CS3', 'CS4', 'CS5'], ['2024-03-01'] * 5, ['Billing'] * 5, [None] * 5,
+                                  ['False', 'true', 'N', None, 1]))
+
+    assert delta['no_show_prediction'].tolist() == [False, True, False, False, True]
+    with pytest.raises(ValueError, match='maybe'):
+        normalize_delta(cases(['CS1'], ['2024-03-01'], ['Billing'], [None], ['maybe']))
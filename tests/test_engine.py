@@ -0,0 +1,73 @@
+import json
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_store import DatasetSnapshot, DatasetView, apply_schema, read_frame, write_columnar
+from engine import (_decode, _encode, build_view, compute, presets, served, snapshot_path_for, wordcloud_frequencies,
+                    write_snapshot)
+
+
+def bigram_cases(bigrams):
+    return apply_schema(pd.DataFrame({
+        'number': [f"CS{i}" for i in range(len(bigrams))],
+        'negative_bigrams': bigrams,
+        'complaint_type': ['Billing'] * len(bigrams),
+        'opened_at_formatted': pd.date_range('2024-03-01', periods=len(bigrams), freq='D'),
+        'complaints': ['Billing'] * len(bigrams),
+        'no_show_prediction': [True] * len(bigrams),
+    }))
+
+
+def value_counts(df):
+    # How the dashboard counted bigrams before the label index.
+    return df['negative_bigrams'].dropna().str.split(', ', expand=True).stack().value_counts()
+
+
+def test_wordcloud_keeps_first_occurring_bigrams():
+    df = bigram_cases(['late bus, zebra crossing', None, 'rude driver', 'late bus, apple core', 'bad line, zebra crossing'])
+    view = DatasetView(DatasetSnapshot(('base', 0), df))
+    counts = value_counts(df)
+
+    assert list(wordcloud_frequencies(view, max_words=2)) == ['rude driver', 'apple core']
+    assert list(wordcloud_frequencies(view)) == list(counts[counts == 1].index)
+    assert list(wordcloud_frequencies(view, unique_only=True, max_words=3)) == list(counts.index[:3])
+
+
+def assert_same(actual, expected):
+    assert type(actual) is type(expected)
+    if isinstance(expected, (pd.DataFrame, pd.Series)):
+        assert actual.equals(expected)
+    else:
+        assert actual == expected
+
+
+def snapshot_cases(tmp_path):
+    df = bigram_cases(['late bus, rude driver', None, 'wrong fare, late bus', 'missed visit', 'rude driver, delay caused'])
+    df['complaints'] = pd.Categorical(['Billing', 'No Show', 'Billing', None, 'No Show'])
+    cache_path = str(tmp_path / 'cases.arrow')
+    write_columnar(df, cache_path)
+    return DatasetSnapshot(('base', 0), read_frame(cache_path), cache_path)
+
+
+def test_aggregates_survive_encoding(tmp_path):
+    dataset = snapshot_cases(tmp_path)
+    for filters in presets(dataset).values():
+        for value in compute(build_view(dataset, **filters)).values():
+            assert_same(_decode(json.loads(json.dumps(_encode(value)))), value)
+
+
+def test_served_matches_compute(tmp_path):
+    dataset = snapshot_cases(tmp_path)
+    write_snapshot(dataset, snapshot_path_for(dataset.cache_path))
+
+    for filters in presets(dataset).values():
+        view = build_view(dataset, **filters)
+        for name, value in compute(view).items():
+            assert_same(served(view, name), value)
+    assert served(build_view(dataset, '2024-03-02', '2024-03-03'), 'records') is None
+    stale = DatasetSnapshot(('base', 1), dataset.df, dataset.cache_path)
+    assert served(build_view(stale), 'records') is None
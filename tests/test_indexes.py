@@ -0,0 +1,78 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_store import DatasetSnapshot, DatasetView, apply_schema
+from indexes import case_count, complaint_type_counts
+
+COMPLAINTS = ['Billing Issues', 'No Show', 'Noise Issue', 'Refund Issues']
+
+
+def random_cases(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    opened = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 90 * 24, n), unit='h')
+    complaints = rng.choice(COMPLAINTS + [None], n)
+    types = [None if complaint is None else ', '.join(sorted({complaint, rng.choice(COMPLAINTS)}))
+             for complaint in complaints]
+    df = pd.DataFrame({
+        'number': [f"CS{i}" for i in range(n)],
+        'complaint_type': types,
+        # A stray date far outside the range, and some cases never given one.
+        'opened_at_formatted': pd.Series(opened).mask(rng.random(n) < 0.05),
+        'complaints': complaints,
+        'no_show_prediction': rng.random(n) < 0.6,
+    })
+    df.loc[0, 'opened_at_formatted'] = pd.Timestamp('1900-01-01')
+    return apply_schema(df)
+
+
+def scan(df, start=None, end=None, complaints=None, no_show_prediction=None):
+    # The sidebar filters applied to the raw frame.
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        day = df['opened_at_formatted'].dt.normalize()
+        mask &= (day >= pd.Timestamp(start)) & (day <= pd.Timestamp(end))
+    if complaints is not None:
+        mask &= df['complaints'].isin(complaints) & (df['no_show_prediction'] == no_show_prediction)
+    return df[mask]
+
+
+def label_counts(df):
+    exploded = df['complaint_type'].dropna().str.split(',').explode().str.strip()
+    return exploded.value_counts().rename('count').rename_axis(None)
+
+
+def assert_answers(view, expected):
+    # Answered by the cube (view.query) and by resolving rows must both match.
+    assert view.query is not None
+    assert case_count(view) == len(expected) == len(view.rows)
+    assert complaint_type_counts(view).sort_index().equals(label_counts(expected).sort_index())
+    assert view.df['number'].take(view.rows).tolist() == expected['number'].tolist()
+
+
+def test_cube_matches_frame_scan():
+    df = random_cases()
+    dataset = DatasetSnapshot(('base', 0), df)
+    for start, end in [('2024-01-01', '2024-03-31'), ('2024-02-10', '2024-02-10'), ('1899-12-01', '1900-01-01'),
+                       ('2025-01-01', '2025-02-01')]:
+        view = DatasetView(dataset).between(start, end)
+        assert_answers(view, scan(df, start, end))
+        for complaints, prediction in [(['No Show'], True), (['Billing Issues', 'Refund Issues'], False), ([], True)]:
+            assert_answers(view.where(complaints, prediction), scan(df, start, end, complaints, prediction))
+
+
+def test_chained_filters_intersect():
+    df = random_cases(seed=1)
+    dataset = DatasetSnapshot(('base', 0), df)
+    narrowed = scan(scan(df, '2024-01-15', '2024-03-01'), '2024-02-01', '2024-03-31', ['No Show', 'Noise Issue'], True)
+
+    view = DatasetView(dataset).where(['No Show', 'Noise Issue'], True).between('2024-01-15', '2024-03-01')
+    assert_answers(view.between('2024-02-01', '2024-03-31'), narrowed)
+
+    view = DatasetView(dataset).between('2024-01-01', '2024-03-31').where(COMPLAINTS[:3], True)
+    assert_answers(view.where(['No Show', 'Refund Issues'], True), scan(df, '2024-01-01', '2024-03-31', ['No Show'], True))
+    assert_answers(view.where(['No Show'], False), df.iloc[:0])
@@ -0,0 +1,55 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from data_store import DatasetSnapshot, apply_schema
+from indexes import negative_bigrams_index
+from keywords import KeywordMatcher, load_matcher, negative_keyword_mask
+
+KEYWORDS_PATH = os.path.join(ROOT, 'negative_keywords.txt')
+
+
+def keyword_filter(values, keywords):
+    # The filter the dashboard applied before KeywordMatcher.
+    return np.array([any(kw in x for kw in keywords) for x in values], dtype=bool)
+
+
+def sample_bigrams():
+    df = pd.read_excel(os.path.join(ROOT, 'No_Show_predicted_labelled.xlsx'), usecols=['negative_bigrams'])
+    return df['negative_bigrams'].dropna().str.split(', ').explode().unique().tolist()
+
+
+def test_matches_agrees_with_substring_filter():
+    keywords = ['issue', 'issues', 'miss', 'missed', 'c++', 'a.b', 'late']
+    values = ['billing issues', 'missed visit', 'c++ error', 'axb', 'a.b test', 'on time', 'latency', '', 'ISSUE raised']
+    matcher = KeywordMatcher(keywords + ['  ', 'issue'])
+
+    assert matcher.matches(values).tolist() == keyword_filter(values, keywords).tolist()
+    assert matcher.hits('missed issues') == ['issues', 'missed']
+    assert not KeywordMatcher([]).matches(values).any()
+
+
+def test_keyword_file_agrees_on_sample_vocabulary():
+    matcher = load_matcher(KEYWORDS_PATH)
+    bigrams = sample_bigrams()
+
+    assert np.array_equal(matcher.matches(bigrams), keyword_filter(bigrams, matcher.keywords))
+
+
+def test_negative_keyword_mask_matches_labels():
+    df = apply_schema(pd.DataFrame({
+        'number': ['CS1', 'CS2', 'CS3'],
+        'negative_bigrams': ['delay caused, nice engineer', 'wrong address', None],
+    }))
+    dataset = DatasetSnapshot(('base', 0), df)
+    matcher = load_matcher(KEYWORDS_PATH)
+
+    mask = negative_keyword_mask(dataset, KEYWORDS_PATH)
+
+    labels = negative_bigrams_index(dataset).labels
+    assert mask.tolist() == keyword_filter(labels, matcher.keywords).tolist()
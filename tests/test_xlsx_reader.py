@@ -0,0 +1,63 @@
+import datetime
+import os
+import sys
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from xlsx_reader import read_workbook
+
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'No_Show_predicted_labelled.xlsx')
+
+
+def cell(value):
+    # One spelling per value, whichever reader (and column type) produced it; mixed
+    # columns are streamed as text, so numeric text compares as the number.
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, float, np.number)):
+        return float(value)
+    if isinstance(value, (datetime.datetime, pd.Timestamp)):
+        return str(pd.Timestamp(value))
+    try:
+        return float(value)
+    except ValueError:
+        return str(value)
+
+
+def row_multiset(df):
+    return Counter(tuple(cell(value) for value in row) for row in df.itertuples(index=False))
+
+
+def assert_matches_read_excel(path, **options):
+    table, stats = read_workbook(path, **options)
+    expected = pd.read_excel(path)
+    streamed = table.to_pandas()
+
+    assert list(streamed.columns) == list(expected.columns)
+    assert stats['rows'] == len(expected)
+    assert row_multiset(streamed) == row_multiset(expected)
+
+
+def test_mixed_workbook_matches_read_excel(tmp_path):
+    path = str(tmp_path / 'cases.xlsx')
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(['number', 'opened_at_formatted', 'number', None, 'no_show_prediction'])
+    for i in range(30):
+        # Dates in the first chunks, then text such as 'March 2024' in a later one.
+        opened = datetime.datetime(2024, 3, 1 + i % 28, 9) if i < 20 else 'March 2024'
+        sheet.append([f"CS{i}", opened, i if i % 7 else None, 'x' if i % 2 else 2.5, i % 3 == 0])
+    workbook.save(path)
+
+    assert_matches_read_excel(path, chunk_rows=8, workers=1)
+
+
+def test_sample_workbook_matches_read_excel():
+    assert_matches_read_excel(SAMPLE_PATH, chunk_rows=100, workers=1)
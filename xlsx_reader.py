@@ -0,0 +1,197 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+import psutil
+import pyarrow as pa
+from openpyxl import load_workbook
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+XLSX_CHUNK_ROWS = int(os.environ.get('CX_XLSX_CHUNK_ROWS', '50000'))
+# '' reads the first sheet (as pd.read_excel does), 'all' every sheet, or a comma-separated list.
+XLSX_SHEETS = os.environ.get('CX_XLSX_SHEETS', '')
+XLSX_WORKERS = int(os.environ.get('CX_XLSX_WORKERS', str(os.cpu_count() or 1)))
+
+
+def peak_rss_bytes():
+    # The OS's RSS high-water mark for this process over its whole life, so unlike
+    # a sample per chunk it cannot miss a spike between chunks.
+    if resource is None:
+        return psutil.Process().memory_info().peak_wset
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _header(row):
+    names, seen = [], {}
+    for i, value in enumerate(row):
+        name = f"Unnamed: {i}" if value is None else str(value)
+        # Same de-duplication as pd.read_excel: repeated headers become name.1, name.2, ...
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        names.append(name if count == 0 else f"{name}.{count}")
+    return names
+
+
+def _to_batch(rows, header):
+    df = pd.DataFrame.from_records(rows, columns=range(len(header)))
+    arrays = []
+    for i in range(len(header)):
+        column = df[i]
+        try:
+            arrays.append(pa.array(column, from_pandas=True))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed cell types (numbers and text in one column) are kept as text.
+            arrays.append(pa.array(column.map(lambda value: None if value is None else str(value)), type=pa.string()))
+    return pa.Table.from_arrays(arrays, names=header)
+
+
+def _as_text(table, columns):
+    # str() of each cell, the same spelling _to_batch gives a mixed chunk (an Arrow
+    # cast would write dates as '2024-03-01 00:00:00.000000').
+    for i, field in enumerate(table.schema):
+        if field.name in columns and not pa.types.is_string(field.type):
+            values = [None if value is None else str(value) for value in table.column(i).to_pylist()]
+            table = table.set_column(i, field.name, pa.array(values, type=pa.string()))
+    return table
+
+
+def concat_batches(tables):
+    # A column can be typed differently from one chunk to the next (dates in one,
+    # text in another); such columns fall back to text, as in a mixed chunk.
+    types = {}
+    for table in tables:
+        for field in table.schema:
+            if not pa.types.is_null(field.type):
+                types.setdefault(field.name, set()).add(field.type)
+    mixed = {name for name, found in types.items()
+             if len(found) > 1 and not all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in found)}
+    if mixed:
+        tables = [_as_text(table, mixed) for table in tables]
+    return pa.concat_tables(tables, promote_options='permissive')
+
+
+def iter_sheet(path, sheet=None, chunk_rows=XLSX_CHUNK_ROWS):
+    # Read-only mode streams the sheet XML instead of building the whole DOM.
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook.worksheets[0] if sheet is None else workbook[sheet]
+        rows = worksheet.iter_rows(values_only=True)
+        header = _header(next(rows, ()))
+        width = len(header)
+        if not width:
+            return
+        chunk = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            chunk.append(row[:width] + (None,) * (width - len(row)))
+            if len(chunk) >= chunk_rows:
+                yield _to_batch(chunk, header)
+                chunk = []
+        if chunk:
+            yield _to_batch(chunk, header)
+    finally:
+        workbook.close()
+
+
+def read_sheet(path, sheet=None, chunk_rows=XLSX_CHUNK_ROWS):
+    tables = list(iter_sheet(path, sheet, chunk_rows))
+    return tables, peak_rss_bytes()
+
+
+def sheet_names(path, sheets=XLSX_SHEETS):
+    if not sheets:
+        return [None]
+    if sheets != 'all':
+        return [name.strip() for name in sheets.split(',') if name.strip()]
+    workbook = load_workbook(path, read_only=True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+def estimate_rows(path, sheets):
+    # From each sheet's stored dimension; None when the writer did not record one.
+    workbook = load_workbook(path, read_only=True)
+    try:
+        total = 0
+        for sheet in sheets:
+            max_row = (workbook.worksheets[0] if sheet is None else workbook[sheet]).max_row
+            if max_row is None:
+                return None
+            total += max(max_row - 1, 0)
+        return total
+    finally:
+        workbook.close()
+
+
+def read_workbook(path, sheets=XLSX_SHEETS, chunk_rows=XLSX_CHUNK_ROWS, workers=XLSX_WORKERS, progress=None):
+    started = time.perf_counter()
+    names = sheet_names(path, sheets)
+    total = estimate_rows(path, names)
+    tables, worker_peaks, done = [], [], 0
+    workers = max(1, min(workers, len(names)))
+
+    if workers == 1:
+        for name in names:
+            for batch in iter_sheet(path, name, chunk_rows):
+                tables.append(batch)
+                done += batch.num_rows
+                if progress is not None:
+                    progress(done, total)
+    else:
+        # One task per sheet: the streaming parser has to walk every earlier row to
+        # reach a row offset, so splitting a single sheet by rows would not save time.
+        parts = [None] * len(names)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(read_sheet, path, name, chunk_rows): i for i, name in enumerate(names)}
+            for future in as_completed(futures):
+                parts[futures[future]], worker_peak = future.result()
+                worker_peaks.append(worker_peak)
+                done += sum(batch.num_rows for batch in parts[futures[future]])
+                if progress is not None:
+                    progress(done, total)
+        tables = [batch for part in parts for batch in part]
+
+    table = concat_batches(tables) if tables else pa.table({})
+    stats = {
+        'rows': table.num_rows,
+        'sheets': len(names),
+        'chunks': len(tables),
+        'workers': workers,
+        'seconds': round(time.perf_counter() - started, 3),
+        'table_bytes': table.nbytes,
+        'peak_rss_bytes': max([peak_rss_bytes()] + worker_peaks),
+    }
+    return table, stats
+
+
+def main(argv=None):
+    from data_store import CACHE_DIR, ensure_cache, load_stats
+
+    parser = argparse.ArgumentParser(description="Stream an SN_CUSTOMERSERVICE_CASE workbook into the columnar cache.")
+    parser.add_argument('workbook')
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    args = parser.parse_args(argv)
+
+    def report(done, total):
+        print(f"\r{done:,} / {total:,} rows" if total else f"\r{done:,} rows", end='', flush=True)
+
+    cache_path = ensure_cache(args.workbook, args.cache_dir, progress=report)
+    print()
+    print(cache_path)
+    for name, value in load_stats(cache_path).items():
+        print(f"{name}: {value}")
+
+
+if __name__ == '__main__':
+    main()